@@ -0,0 +1,97 @@
+"""
+Latency of the duplicate survey check (rmn_etl.dedupe.find_existing_tables)
+as the tables fill up, with and without the (rmn_id, grant_id, visit) indexes.
+
+For each size, a scratch schema gets one small table per target table holding
+that many surveys, and the check is timed for a survey that is present and
+one that is not: first on the bare tables (sequential scans), then after
+adding the survey indexes of migrations/0005. The check runs as a prepared
+statement, as in the loaders; 'plain ms' times the present survey with the
+query parsed and planned every time. The schema is dropped at the end.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_dedupe --dsn "dbname=rmn user=postgres host=localhost" [--surveys 1000 10000 100000]
+"""
+
+import argparse
+import time
+
+import psycopg2
+
+from rmn_etl.dedupe import find_existing_tables
+from rmn_etl.loader import KEY_COLUMNS, NATURAL_KEYS
+
+
+BENCH_SCHEMA = "rmn_dedupe_bench"
+ROWS_PER_SURVEY = 5
+
+
+def build_tables(cur, surveys):
+    cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    for table in NATURAL_KEYS:
+        cur.execute(
+            f"CREATE TABLE {BENCH_SCHEMA}.{table} ("
+            f"  rmn_id VARCHAR(10), grant_id VARCHAR(10), visit VARCHAR(50), sampling_point VARCHAR(255), notes VARCHAR)"
+        )
+        cur.execute(
+            f"INSERT INTO {BENCH_SCHEMA}.{table} "
+            f"SELECT 'MS' || (s %% 1000), (500000 + s / 1000)::text, (1 + s %% 5) || '-year', 'Q_' || r, 'note' "
+            f"FROM generate_series(0, %s - 1) s, generate_series(1, %s) r",
+            (surveys, ROWS_PER_SURVEY),
+        )
+        cur.execute(f"ANALYZE {BENCH_SCHEMA}.{table}")
+
+
+def add_survey_indexes(cur):
+    for table in NATURAL_KEYS:
+        cur.execute(f"CREATE INDEX {table}_survey_idx ON {BENCH_SCHEMA}.{table} (rmn_id, grant_id, visit)")
+        cur.execute(f"ANALYZE {BENCH_SCHEMA}.{table}")
+
+
+def time_check(conn, values, repeat, prepare=True):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = find_existing_tables(conn, NATURAL_KEYS, KEY_COLUMNS, values, schema=BENCH_SCHEMA, prepare=prepare)
+    return (time.perf_counter() - start) / repeat * 1000, len(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the duplicate survey check against growing tables.")
+    parser.add_argument('--dsn', type=str, required=True, help="libpq connection string of a scratch database")
+    parser.add_argument('--surveys', type=int, nargs='+', default=[1_000, 10_000, 100_000], help="Surveys per table")
+    parser.add_argument('--repeat', type=int, default=20, help="Checks timed per case")
+    args = parser.parse_args()
+
+    present = ['MS7', '500000', '3-year']  # s = 7, in every table
+    absent = ['MS7', '999999', '3-year']
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        print(f"{'surveys':>8s} {'rows/table':>10s} {'index':>6s} {'present ms':>11s} {'absent ms':>10s} {'plain ms':>9s}")
+        for surveys in args.surveys:
+            with conn.cursor() as cur:
+                build_tables(cur, surveys)
+            conn.commit()
+
+            for index in ('no', 'yes'):
+                if index == 'yes':
+                    with conn.cursor() as cur:
+                        add_survey_indexes(cur)
+                    conn.commit()
+                hit_ms, hits = time_check(conn, present, args.repeat)
+                miss_ms, _ = time_check(conn, absent, args.repeat)
+                plain_ms, _ = time_check(conn, present, args.repeat, prepare=False)
+                conn.rollback()
+                print(f"{surveys:>8d} {surveys * ROWS_PER_SURVEY:>10d} {index:>6s} {hit_ms:>11.2f} {miss_ms:>10.2f} {plain_ms:>9.2f}"
+                      + ("" if hits == len(NATURAL_KEYS) else "  (survey not found!)"))
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Per-feature geometry handling (the old spatial reader) against the shapely 2
+array functions of rmn_etl.geometry, on synthetic layers of growing size.
+Both paths are checked to give the same geometries.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_geometry [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import shapely
+from shapely import MultiPolygon, Point, Polygon
+
+from rmn_etl.geometry import force_2d, to_ewkb_hex, to_multipolygons
+
+
+def synthetic_points(n, seed=0):
+    """3D GNSS points around the British National Grid origin of a site"""
+    rng = np.random.default_rng(seed)
+    xyz = np.column_stack([rng.uniform(250000, 260000, n), rng.uniform(730000, 740000, n), rng.uniform(300, 900, n)])
+    return shapely.points(xyz)
+
+
+def synthetic_polygons(n, seed=0):
+    """Square polygons, one in ten already a MultiPolygon"""
+    rng = np.random.default_rng(seed)
+    x, y = rng.uniform(250000, 260000, n), rng.uniform(730000, 740000, n)
+    polygons = shapely.box(x, y, x + 10, y + 10)
+    polygons[::10] = shapely.multipolygons(polygons[::10], indices=np.arange(len(polygons[::10])))
+    return polygons
+
+
+def old_points(geoms):
+    geoms = [Point(point.x, point.y) for point in geoms]
+    return [geom.wkt for geom in geoms]
+
+
+def old_polygons(geoms):
+    geoms = [MultiPolygon([geom]) if isinstance(geom, Polygon) else geom for geom in geoms]
+    return [geom.wkt for geom in geoms]
+
+
+def new_points(geoms):
+    return to_ewkb_hex(force_2d(geoms))
+
+
+def new_polygons(geoms):
+    return to_ewkb_hex(to_multipolygons(geoms))
+
+
+def timed(func, geoms):
+    start = time.perf_counter()
+    result = func(geoms)
+    return time.perf_counter() - start, result
+
+
+def same_geometries(old_wkt, new_ewkb):
+    old = shapely.from_wkt(np.asarray(old_wkt, dtype=object))
+    new = shapely.from_wkb(new_ewkb)
+    return bool(shapely.equals_exact(old, new, tolerance=0).all()) and bool((shapely.get_srid(new) == 27700).all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized geometry stage.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help="Features per layer")
+    args = parser.parse_args()
+
+    print(f"{'layer':10s} {'features':>9s} {'per feature':>12s} {'vectorized':>11s} {'speed-up':>9s}")
+    for n in args.sizes:
+        for name, make, old, new in [("points", synthetic_points, old_points, new_points),
+                                     ("polygons", synthetic_polygons, old_polygons, new_polygons)]:
+            geoms = make(n)
+            old_time, old_result = timed(old, geoms)
+            new_time, new_result = timed(new, geoms)
+            if not same_geometries(old_result, new_result):
+                raise AssertionError(f"{name}: geometries differ for {n} features")
+            print(f"{name:10s} {n:9d} {old_time:11.3f}s {new_time:10.3f}s {old_time / new_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
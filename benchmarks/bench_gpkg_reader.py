@@ -0,0 +1,67 @@
+"""
+Read time of each mapped geopackage layer: the old path (gpd.read_file of the
+whole layer, then the source == 'field' filter in pandas) against
+rmn_etl.geopackage.read_layer (mapped fields only, Arrow output, filter as SQL).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_gpkg_reader "path/to/monitoring.gpkg" [--map map.xlsx]
+    python -m benchmarks.bench_gpkg_reader --quadrats 5000   # synthetic geopackage, see benchmarks.synthetic
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import geopandas as gpd
+
+from benchmarks.synthetic import write_survey
+from rmn_etl.geopackage import LAYER_FILTERS, USE_ARROW, layer_names, read_layer
+from rmn_etl.mapping import MAP_PATH, load_mapping
+
+
+def read_file_path(path, layer):
+    """The read of the spatial reader before rmn_etl.geopackage"""
+    df = gpd.read_file(path, layer=layer)
+    if layer == 'sampling_point':
+        df = df[df['source'] == 'field'].reset_index(drop=True)
+    return df
+
+
+def best_time(read, repeat):
+    best, df = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the pruned geopackage reader against gpd.read_file.")
+    parser.add_argument('path', type=str, nargs='?', default=None, help="monitoring.gpkg, a synthetic one when left out")
+    parser.add_argument('--map', type=str, default=MAP_PATH, help="Mapping workbook of the survey")
+    parser.add_argument('--quadrats', type=int, default=5000, help="Size of the synthetic geopackage")
+    parser.add_argument('-n', '--repeat', type=int, default=5, help="Repeats, best time is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path, map_path = args.path, args.map
+        if path is None:
+            _, path, map_path = write_survey(tmp, quadrats=args.quadrats, drains=args.quadrats * 5)
+        mapping = load_mapping(map_path, use_cache=False)
+        layers = [s for s in layer_names(path) if s in mapping.sheets]
+        print(f"{path} ({os.path.getsize(path) / 1024:.0f} KB), Arrow: {USE_ARROW}")
+
+        print(f"{'layer':16s} {'read_file s':>11s} {'pruned s':>9s} {'speedup':>8s} {'rows':>8s} {'columns':>12s}")
+        for layer in layers:
+            old_s, old = best_time(lambda: read_file_path(path, layer), args.repeat)
+            new_s, new = best_time(lambda: read_layer(path, layer, mapping[layer].rename), args.repeat)
+            rows = f"{len(new)}" if len(new) == len(old) else f"{len(new)}!={len(old)}"
+            print(f"{layer:16s} {old_s:>11.4f} {new_s:>9.4f} {old_s / new_s:>7.2f}x {rows:>8s} "
+                  f"{old.shape[1]:>5d} -> {new.shape[1]:<4d}" + (" (filtered)" if layer in LAYER_FILTERS else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Check normalise_sampling_points against modify_sampling_point on random ids,
+then time both over a column of a million ids.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_ids [--rows 1000000] [--cases 200000]
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from rmn_etl.ids import modify_sampling_point, normalise_sampling_points
+
+
+## characters that exercise the edge cases: separators, ascii and non-ascii digits, white space
+ALPHABET = "_MSQDG0123456789ab \n٣²①"
+
+
+def random_id(rng):
+    if rng.random() < 0.5:
+        # realistic id, e.g. MS04_Q_7 or MS04_D_12
+        return f"MS{rng.randint(1, 20):02d}_{rng.choice('QDGHB')}_{rng.randint(0, 120)}"
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 8)))
+
+
+def check_equivalence(cases, seed=0):
+    """Property check: the vectorized normaliser gives modify_sampling_point's output for every id"""
+    rng = random.Random(seed)
+    ids = pd.Series([random_id(rng) for _ in range(cases)] + [None], dtype=object)
+    expected = [modify_sampling_point(v) if v is not None else None for v in ids]
+    result = normalise_sampling_points(ids).tolist()
+    mismatches = [(v, e, r) for v, e, r in zip(ids, expected, result) if e != r]
+    if mismatches:
+        raise AssertionError(f"{len(mismatches)} ids differ, first: {mismatches[:5]}")
+    print(f"Equivalent on {cases} random ids")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sampling point id normalisation.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Ids in the timed column")
+    parser.add_argument('--cases', type=int, default=200_000, help="Random ids in the equivalence check")
+    args = parser.parse_args()
+
+    check_equivalence(args.cases)
+
+    rng = random.Random(1)
+    ids = pd.Series([f"MS{rng.randint(1, 20):02d}_Q_{rng.randint(1, 60)}" for _ in range(args.rows)], dtype=object)
+
+    start = time.perf_counter()
+    old = ids.apply(modify_sampling_point)
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = normalise_sampling_points(ids)
+    new_time = time.perf_counter() - start
+
+    pd.testing.assert_series_equal(old, new)
+
+    print(f"Ids:                  {args.rows}")
+    print(f".apply:               {old_time:.3f} s")
+    print(f"vectorized:           {new_time:.3f} s")
+    print(f"Speed-up:             {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
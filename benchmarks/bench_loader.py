@@ -0,0 +1,88 @@
+"""
+Rows per second for the COPY, INSERT and MERGE load paths against a local PostgreSQL.
+
+Loads a synthetic vegetation frame into a TEMP copy of the vegetation table,
+so nothing is left behind in the database. MERGE is timed twice: into the
+empty table, then again with the same frame, when every row is unchanged.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_loader --dsn "dbname=rmn user=postgres host=localhost" [--rows 100000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from rmn_etl.cleaning import to_db_nulls
+from rmn_etl.loader import NATURAL_KEYS, copy_dataframe, insert_dataframe, merge_dataframe, number_entries
+
+
+TABLE_DDL = """
+CREATE TEMP TABLE vegetation_bench (
+    rmn_id VARCHAR(10),
+    grant_id VARCHAR(10),
+    visit VARCHAR(50),
+    sampling_point VARCHAR(255),
+    species VARCHAR(255),
+    cover DECIMAL(5,2),
+    notes VARCHAR,
+    entry INT NOT NULL DEFAULT 1,
+    UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, species, entry)
+)
+"""
+
+
+def synthetic_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "sampling_point": [f"MS01_Q_{i // 12 % 50 + 1:02d}" for i in range(rows)],
+        "species": rng.choice(["Calluna vulgaris", "Sphagnum capillifolium", "Not Applicable"], rows),
+        "cover": rng.integers(0, 100, rows).astype(float),
+        "notes": np.where(rng.random(rows) < 0.8, None, "checked, with comma"),
+    })
+    df["rmn_id"] = "MS01"
+    df["grant_id"] = "502418"
+    df["visit"] = "1-year"
+    return to_db_nulls(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare COPY, INSERT and MERGE load throughput.")
+    parser.add_argument('--dsn', type=str, required=True, help="libpq connection string of a scratch database")
+    parser.add_argument('--rows', type=int, default=100_000, help="Rows to load")
+    args = parser.parse_args()
+
+    keys = NATURAL_KEYS["vegetation"]
+    ## repeated species of a quadrat are numbered apart, as DatabaseSink does
+    df, _ = number_entries(synthetic_frame(args.rows), keys)
+    runs = [
+        ("copy", lambda cur: copy_dataframe(cur, df, "vegetation_bench"), True),
+        ("insert", lambda cur: insert_dataframe(cur, df, "vegetation_bench"), True),
+        ("merge", lambda cur: merge_dataframe(cur, df, "vegetation_bench", keys), True),
+        ("re-merge", lambda cur: merge_dataframe(cur, df, "vegetation_bench", keys), False),
+    ]
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(TABLE_DDL)
+            for method, load, truncate in runs:
+                if truncate:
+                    cur.execute("TRUNCATE vegetation_bench")
+                    conn.commit()
+                start = time.perf_counter()
+                load(cur)
+                conn.commit()
+                elapsed = time.perf_counter() - start
+                cur.execute("SELECT count(*) FROM vegetation_bench")
+                loaded = cur.fetchone()[0]
+                print(f"{method:8s} {loaded} rows in {elapsed:.3f} s -> {loaded / elapsed:,.0f} rows/s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
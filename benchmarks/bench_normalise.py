@@ -0,0 +1,79 @@
+"""
+Benchmark the vectorized cell normalisation against the old applymap/replace
+passes on a synthetic Vegetation sheet, and check both give the same frame.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_normalise [--rows 100000]
+"""
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from rmn_etl.cleaning import normalise_cells, to_db_nulls
+
+warnings.simplefilter("ignore", FutureWarning)  # DataFrame.applymap is deprecated in pandas 2.1
+
+
+def synthetic_vegetation(rows, seed=0):
+    """One row per species per quadrat, with the dtype row the template carries on top."""
+    rng = np.random.default_rng(seed)
+    species = np.array(["Calluna vulgaris", "Sphagnum capillifolium", "Eriophorum vaginatum", "NA", " NA ", "", "  "], dtype=object)
+    cover = rng.integers(0, 100, rows).astype(object)
+    cover[rng.random(rows) < 0.1] = np.nan
+    cover[rng.random(rows) < 0.05] = "NA"
+    notes = np.full(rows, "checked", dtype=object)
+    notes[rng.random(rows) < 0.8] = np.nan
+    df = pd.DataFrame({
+        "Sampling point": [f"MS01_Q_{i // 12 % 50 + 1}" for i in range(rows)],
+        "Species": species[rng.integers(0, len(species), rows)],
+        "Cover (%)": cover,
+        "Notes": notes,
+    })
+    dtype_row = pd.DataFrame([["Text", "Text", "Decimal", "Text"]], columns=df.columns)
+    return pd.concat([dtype_row, df], ignore_index=True)
+
+
+def legacy(df):
+    df = df.applymap(lambda x: "Not Applicable" if isinstance(x,str) and x.strip() == "NA" else x)
+    df = df.applymap(lambda x: None if x in [np.nan, None, ""] else x)
+    df = df.dropna(axis=0, how='all')
+    df = df.replace(r'^\s*$', np.nan, regex=True)
+    return df.replace({np.nan: None})
+
+
+def vectorized(df):
+    df = normalise_cells(df)
+    df = df.dropna(axis=0, how='all')
+    return to_db_nulls(df)
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NA/empty-cell normalisation.")
+    parser.add_argument('--rows', type=int, default=100_000, help="Rows in the synthetic Vegetation sheet")
+    args = parser.parse_args()
+
+    df = synthetic_vegetation(args.rows)
+
+    old_time, old = timed(legacy, df)
+    new_time, new = timed(vectorized, df)
+
+    pd.testing.assert_frame_equal(old, new)
+
+    print(f"Rows:                 {len(df)}")
+    print(f"applymap + replace:   {old_time:.3f} s")
+    print(f"vectorized:           {new_time:.3f} s")
+    print(f"Speed-up:             {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
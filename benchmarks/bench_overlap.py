@@ -0,0 +1,72 @@
+"""
+Wall time of both readers on one survey, with the push of each table waiting
+on a slow database, sheets and layers prepared one after another and then
+ahead of the push (load_*_survey(overlap=True)).
+
+The remapped tables go to a sink that sleeps for --latency seconds per table,
+standing in for a COPY across a VPN (the sleep releases the GIL, as psycopg2
+does while it waits on the server). With overlap the run should take about
+max(prepare, push) instead of their sum.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_overlap "path/to/survey.xlsx" "path/to/monitoring.gpkg" [--map map.xlsx]
+    python -m benchmarks.bench_overlap --quadrats 2000 --latency 0.5   # synthetic survey, see benchmarks.synthetic
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from benchmarks.synthetic import write_survey
+from rmn_etl.excel import load_excel_survey
+from rmn_etl.mapping import MAP_PATH, load_mapping
+from rmn_etl.spatial import load_spatial_survey
+
+
+def time_reader(load, path, mapping, latency, overlap):
+    """Wall time of the reader, the rows it produced and the time spent in the sink"""
+    pushed = []
+
+    def slow_sink(table, df):
+        time.sleep(latency)
+        pushed.append(latency)
+        return len(df)
+
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        loaded = load(path, 'MS01', '502418', '1-year', mapping=mapping, sink=slow_sink, overlap=overlap)
+    return time.perf_counter() - start, sum(loaded.values()), sum(pushed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the readers with and without overlapping preparation and push.")
+    parser.add_argument('excel_path', type=str, nargs='?', default=None, help="Survey .xlsx file, a synthetic one when left out")
+    parser.add_argument('gpkg_path', type=str, nargs='?', default=None, help="Survey monitoring.gpkg file")
+    parser.add_argument('--map', type=str, default=MAP_PATH, help="Mapping workbook of the survey")
+    parser.add_argument('--quadrats', type=int, default=1000, help="Size of the synthetic survey")
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds the sink waits per table")
+    args = parser.parse_args()
+
+    pd.options.mode.chained_assignment = None  # default='warn'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path, gpkg_path, map_path = args.excel_path, args.gpkg_path, args.map
+        if excel_path is None:
+            excel_path, gpkg_path, map_path = write_survey(tmp, quadrats=args.quadrats, drains=args.quadrats * 2)
+        mapping = load_mapping(map_path, use_cache=False)
+
+        print(f"{'reader':>8s} {'push s':>7s} {'serial s':>9s} {'overlap s':>10s} {'saved s':>8s} {'rows':>8s}")
+        for name, load, path in [('excel', load_excel_survey, excel_path), ('spatial', load_spatial_survey, gpkg_path)]:
+            if not path:
+                continue
+            serial, rows, pushed = time_reader(load, path, mapping, args.latency, overlap=False)
+            overlapped, _, _ = time_reader(load, path, mapping, args.latency, overlap=True)
+            print(f"{name:>8s} {pushed:>7.2f} {serial:>9.2f} {overlapped:>10.2f} {serial - overlapped:>8.2f} {rows:>8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Wall time of the Excel reader on one workbook, sheets processed one after
+another and then in worker processes (load_excel_survey(workers=n)).
+
+The remapped tables go to a sink that only counts them, so the figures are
+the read, prepare and remap of the sheets, not the push. Each worker opens the
+workbook once, so the gain needs spare cores and sheets large enough to pay
+for parsing the shared strings again in every worker.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_sheet_workers "path/to/survey.xlsx" [--workers 0 2 4] [--map map.xlsx]
+    python -m benchmarks.bench_sheet_workers --quadrats 2000   # synthetic survey, see benchmarks.synthetic
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from benchmarks.synthetic import write_survey
+from rmn_etl.excel import load_excel_survey
+from rmn_etl.mapping import MAP_PATH, load_mapping
+
+
+def time_reader(path, mapping, workers, repeat):
+    """Best wall time of the reader over repeat runs, and the rows it produced"""
+    best, rows = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            loaded = load_excel_survey(path, 'MS01', '502418', '1-year', mapping=mapping,
+                                       sink=lambda table, df: len(df), workers=workers)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+        rows = sum(loaded.values())
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Excel reader with and without per-sheet workers.")
+    parser.add_argument('path', type=str, nargs='?', default=None, help="Survey .xlsx file, a synthetic one when left out")
+    parser.add_argument('--map', type=str, default=MAP_PATH, help="Mapping workbook of the survey")
+    parser.add_argument('--quadrats', type=int, default=1000, help="Size of the synthetic survey")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4], help="Worker counts to time, 0 is serial")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="Repeats, best time is reported")
+    args = parser.parse_args()
+
+    pd.options.mode.chained_assignment = None  # default='warn'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path, map_path = args.path, args.map
+        if path is None:
+            path, _, map_path = write_survey(tmp, quadrats=args.quadrats, drains=args.quadrats)
+        mapping = load_mapping(map_path, use_cache=False)
+        print(f"{path} ({os.path.getsize(path) / 1024:.0f} KB), {os.cpu_count()} CPUs")
+
+        serial = None
+        print(f"{'workers':>7s} {'seconds':>8s} {'speedup':>8s} {'rows':>8s}")
+        for workers in args.workers:
+            seconds, rows = time_reader(path, mapping, workers, args.repeat)
+            serial = serial or seconds
+            print(f"{workers:>7d} {seconds:>8.2f} {serial / seconds:>7.2f}x {rows:>8d}")
+
+
+if __name__ == "__main__":
+    main()
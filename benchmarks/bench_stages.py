@@ -0,0 +1,105 @@
+"""
+Time every stage of both readers on synthetic surveys of growing size.
+
+For each size a survey is generated with benchmarks.synthetic, then the Excel
+and spatial readers run against it with a RunMetrics recorder. The table shows
+the best time of each stage over the repeats, summed over sheets and layers,
+with the rows it handled.
+
+Without --dsn the remapped tables go to a sink that only counts them, so the
+dedupe and push stages are not run. With --dsn the pa_restoration_monitoring_network
+schema of that database is dropped and recreated from db_queries.sql and
+migrations/, and every survey is pushed in a dry-run transaction (rolled back)
+so each repeat loads into the same empty tables. Use a throwaway database with PostGIS.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_stages [--quadrats 100 1000] [--dsn "dbname=rmn_bench user=postgres host=localhost"]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from benchmarks.synthetic import write_survey
+from rmn_etl.dedupe import SCHEMA
+from rmn_etl.excel import load_excel_survey
+from rmn_etl.mapping import load_mapping
+from rmn_etl.metrics import RunMetrics
+from rmn_etl.migrations import apply_migrations
+from rmn_etl.spatial import load_spatial_survey
+
+
+def create_schema(conn):
+    """Recreate the RMN schema from db_queries.sql and the migrations"""
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+        ## db_queries.sql starts with a plain DROP SCHEMA, which needs the schema to exist
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        with open('db_queries.sql') as f:
+            cur.execute(f.read())
+    conn.commit()
+    apply_migrations(conn)
+
+
+def counting_sink(table, df):
+    return len(df)
+
+
+def run_once(paths, mapping, conn):
+    """Load the survey once with both readers, returning the stage records"""
+    xlsx, gpkg, _ = paths
+    metrics = RunMetrics('bench', track_memory=False)
+    sink = None if conn is not None else counting_sink
+    options = dict(conn=conn, mapping=mapping, sink=sink, dry_run=conn is not None, metrics=metrics)
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        load_excel_survey(xlsx, 'MS01', '502418', '1-year', **options)
+        load_spatial_survey(gpkg, 'MS01', '502418', '1-year', **options)
+    return pd.DataFrame(metrics.stages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each reader stage on synthetic surveys.")
+    parser.add_argument('--quadrats', type=int, nargs='+', default=[100, 1000], help="Survey sizes, in quadrats")
+    parser.add_argument('--species', type=int, default=12, help="Vegetation rows per quadrat")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="Repeats, best time is reported")
+    parser.add_argument('--dsn', type=str, default=None, help="libpq connection string of a throwaway PostGIS database")
+    args = parser.parse_args()
+
+    pd.options.mode.chained_assignment = None  # default='warn'
+
+    conn = None
+    if args.dsn:
+        import psycopg2
+        conn = psycopg2.connect(args.dsn)
+        create_schema(conn)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for quadrats in args.quadrats:
+                out_dir = os.path.join(tmp, str(quadrats))
+                start = time.perf_counter()
+                paths = write_survey(out_dir, quadrats=quadrats, species=args.species, drains=quadrats)
+                mapping = load_mapping(paths[2], use_cache=False)
+                print(f"\n{quadrats} quadrats ({os.path.getsize(paths[0]) / 1024:.0f} KB workbook, "
+                      f"{os.path.getsize(paths[1]) / 1024:.0f} KB geopackage, generated in {time.perf_counter() - start:.1f} s)")
+
+                runs = [run_once(paths, mapping, conn) for _ in range(args.repeat)]
+                stages = pd.concat([r.assign(run=i) for i, r in enumerate(runs)])
+                if conn is None:
+                    stages = stages[stages['stage'] != 'push']  # the counting sink, nothing to time
+                per_run = stages.groupby(['stage', 'run'], sort=False).agg(seconds=('seconds', 'sum'), rows=('rows', 'sum'))
+                best = per_run.groupby(level='stage', sort=False).agg(seconds=('seconds', 'min'), rows=('rows', 'max'))
+                best['rows/s'] = (best['rows'] / best['seconds']).round(0)
+                print(best.to_string())
+                print(f"total {best['seconds'].sum():.3f} s")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Timing report: one pd.read_excel per sheet (old path) against the
+single-pass read_workbook loader.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_workbook_loader "path/to/survey.xlsx" [-n 3]
+"""
+
+import argparse
+import time
+
+import pandas as pd
+
+from rmn_etl.workbook import SHEET_READ_OPTIONS, read_workbook
+
+
+def read_per_sheet(file_path, sheets):
+    """Old path: reopen the workbook for every sheet."""
+    workbook = {}
+    for s in sheets:
+        try:
+            workbook[s] = pd.read_excel(file_path, sheet_name=s, **SHEET_READ_OPTIONS[s])
+        except ValueError:
+            pass  # sheet not in workbook
+    return workbook
+
+
+def best_of(func, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-sheet and single-pass workbook reads.")
+    parser.add_argument('path', type=str, help="Survey workbook (.xlsx)")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="Repeats, best time is reported")
+    args = parser.parse_args()
+
+    sheets = list(SHEET_READ_OPTIONS)
+
+    old_time, old = best_of(read_per_sheet, args.repeat, args.path, sheets)
+    new_time, new = best_of(read_workbook, args.repeat, args.path, sheets)
+
+    for s in old:
+        pd.testing.assert_frame_equal(old[s], new[s])
+
+    print(f"Sheets read:          {len(new)} ({', '.join(new)})")
+    print(f"pd.read_excel/sheet:  {old_time:.3f} s")
+    print(f"read_workbook:        {new_time:.3f} s")
+    print(f"Speed-up:             {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Synthetic RMN surveys for the benchmarks: an Excel template, a monitoring
+geopackage and the mapping workbook that ties them to the database tables.
+
+The workbook follows the layouts the Excel reader expects:
+    Desk study                 questions in column B, answers in column C (read transposed)
+    Feature status - *         title row, header row, data type row, then one row per point
+    Quadrat information,
+    Vegetation, Photos         header row, data type row, then one row per record
+    Area-level assessment      fixed cells B2:C6 and B10:D30
+
+The geopackage holds monitoring_area, sampling_point (3D points, planned and
+field), drain_points and fpp_points in EPSG:27700. fpp_points is generated but
+not mapped: its easting/northing columns are DECIMAL(10,6) in db_queries.sql
+and cannot hold British National Grid coordinates.
+
+Usage (from the repository root):
+    python -m benchmarks.synthetic out_dir [--quadrats 200] [--species 12] [--drains 300]
+"""
+
+import argparse
+import datetime
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from openpyxl import Workbook
+
+
+SPECIES = [
+    "Calluna vulgaris", "Erica tetralix", "Eriophorum vaginatum", "Eriophorum angustifolium",
+    "Trichophorum germanicum", "Molinia caerulea", "Sphagnum capillifolium", "Sphagnum papillosum",
+    "Sphagnum fallax", "Hypnum jutlandicum", "Cladonia portentosa", "Vaccinium myrtillus",
+    "Empetrum nigrum", "Rubus chamaemorus", "Narthecium ossifragum", "Drosera rotundifolia",
+    "Juncus effusus", "Deschampsia flexuosa", "Polytrichum commune", "Racomitrium lanuginosum",
+]
+
+## Excel sheets: (target table, database columns). The template field name of a column is
+## field_name(column), e.g. veg_height_1 -> "Veg height 1"
+EXCEL_SHEETS = {
+    'Desk study': ('desk_study', [
+        'site', 'grant_notes', 'condition_category', 'aerial_imagery_notes', 'land_use', 'land_use_notes',
+        'land_use_change_notes', 'deer_density_notes', 'herbivore_impact_notes', 'general_notes']),
+    'Quadrat information': ('quadrat_information', [
+        'sampling_point', 'date', 'surveyors', 'markers_found', 'feature_type', 'quadrat_type', 'aspect',
+        'peat_depth', 'bare_peat', 'bare_mineral', 'open_water', 'litter', 'trampling', 'dung', 'trees',
+        'veg_height_1', 'veg_height_2', 'veg_height_3', 'veg_height_4', 'veg_height_5',
+        'disturbance_notes', 'quadrat_notes']),
+    'Vegetation': ('vegetation', ['sampling_point', 'species', 'cover', 'notes']),
+    'Photos': ('photos', ['title', 'date', 'photographer', 'bearing', 'notes', 'dams_link']),
+    'Feature status - drains': ('feature_status_drains', [
+        'sampling_point', 'drain_point', 'drain_identifiable', 'depth', 'width', 'flow', 'bare_peat',
+        'vegetation', 'sphagnum', 'block_present', 'donor', 'score', 'notes']),
+    'Feature status - gullies': ('feature_status_gullies', [
+        'sampling_point', 'depth', 'width', 'side', 'angle', 'vegetation_establishing', 'trampling', 'flow',
+        'score', 'notes']),
+    'Feature status - hags or banks': ('feature_status_hags', [
+        'sampling_point', 'height', 'angle', 'vegetation_establishing', 'trampling', 'erosion', 'score', 'notes']),
+    'Feature status - bare peat': ('feature_status_bare_peat', [
+        'sampling_point', 'area', 'vegetation_establishing', 'trampling', 'erosion', 'bund_present', 'score',
+        'notes']),
+    'Feature status - F2B': ('feature_status_forest_to_bog', [
+        'sampling_point', 'tree_cover', 'tree_height', 'mulch', 'bare_peat', 'tree_regen', 'ground_level',
+        'peat_cracking', 'score', 'notes']),
+}
+
+AREA_MAIN = ['site', 'survey_dates', 'surveyors', 'weather', 'ground_conditions']  # B2:B6
+AREA_EXTRA = [  # B10:B30, with notes in column D
+    'nvc_approximate', 'bare_peat', 'dwarf_shrub', 'eriophorum', 'trichophorum', 'molinia', 'other_poaceae',
+    'sphagnum', 'trees', 'inns', 'restoration_activities', 'bare_peat_impact', 'drain_intensity',
+    'drain_status', 'burning', 'herbivore_ground_disturbance', 'herbivore_grazing', 'trees_impact',
+    'peat_extraction', 'human_infrastructure', 'other_damage',
+]
+
+## geopackage layers: (target table, [(layer field, database column)])
+SPATIAL_LAYERS = {
+    'monitoring_area': ('monitoring_area', [('geometry', 'geometry')]),
+    'sampling_point': ('sampling_points', [
+        ('sampling_point', 'sampling_point_id'), ('date', 'date'), ('horizontal_accuracy', 'horizontal_accuracy'),
+        ('vertical_accuracy', 'vertical_accuracy'), ('elevation', 'elevation'), ('satellites', 'satellites'),
+        ('source', 'source'), ('gnss_height', 'gnss_height'), ('feature_type', 'feature_type'),
+        ('corner', 'corner'), ('geometry', 'geometry')]),
+    'drain_points': ('drain_points', [
+        ('sampling_point', 'sampling_point_id'), ('drain_point', 'drain_point_id'), ('date', 'date'),
+        ('horizontal_accuracy', 'horizontal_accuracy'), ('vertical_accuracy', 'vertical_accuracy'),
+        ('elevation', 'elevation'), ('satellites', 'satellites'), ('gnss_height', 'gnss_height'),
+        ('geometry', 'geometry')]),
+}
+
+BOOLEAN_COLUMNS = {
+    'drain_identifiable', 'vegetation_establishing', 'trampling', 'flow', 'erosion', 'bund_present', 'donor',
+    'tree_regen', 'ground_level', 'peat_cracking',
+}
+INT_COLUMNS = {'peat_depth', 'bearing', 'veg_height_1', 'veg_height_2', 'veg_height_3', 'veg_height_4', 'veg_height_5'}
+DECIMAL_COLUMNS = {'cover', 'bare_mineral', 'open_water', 'litter'}
+
+
+def field_name(column):
+    """Template field name of a database column"""
+    return column.replace('_', ' ').capitalize()
+
+
+def sampling_point_ids(prefix, n):
+    """Ids as surveyors write them, without zero padding (MS01_Q_1), which the reader normalises"""
+    return [f"{prefix}_{i + 1}" for i in range(n)]
+
+
+def _value(column, row, rng, point=None, date=None):
+    if column == 'sampling_point':
+        return point
+    if column == 'date':
+        return date
+    if column in BOOLEAN_COLUMNS:
+        return 'Yes' if rng.random() < 0.5 else 'No'
+    if column in INT_COLUMNS:
+        return int(rng.integers(0, 360 if column == 'bearing' else 100))
+    if column in DECIMAL_COLUMNS or column == 'bare_peat':
+        return round(float(rng.uniform(0, 100)), 1)
+    if column.endswith('notes'):
+        return None if rng.random() < 0.7 else f"Note {row}, checked on site"
+    return 'NA' if rng.random() < 0.1 else f"{column} {int(rng.integers(1, 5))}"
+
+
+def _record_rows(columns, points, rng, date):
+    rows = []
+    for i, point in enumerate(points):
+        rows.append([_value(c, i, rng, point, date) for c in columns])
+    return rows
+
+
+def _dtype_row(columns):
+    return ['Yes/No' if c in BOOLEAN_COLUMNS else 'Number' if c in INT_COLUMNS | DECIMAL_COLUMNS else 'Text'
+            for c in columns]
+
+
+def write_survey_workbook(path, rmn_id='MS01', quadrats=200, species=12, drains=300, seed=0):
+    """
+    Write a synthetic survey workbook.
+
+    Parameters:
+        path (str): .xlsx file to write.
+        rmn_id (str): Prefix of the sampling point ids.
+        quadrats (int): Quadrats, each with a Quadrat information and a Photos row.
+        species (int): Vegetation rows per quadrat.
+        drains (int): Points in each Feature status sheet.
+    """
+    rng = np.random.default_rng(seed)
+    date = datetime.datetime(2024, 7, 15)
+    quadrat_ids = sampling_point_ids(f"{rmn_id}_Q", quadrats)
+    drain_ids = sampling_point_ids(f"{rmn_id}_D", drains)
+
+    wb = Workbook(write_only=True)
+
+    ## Desk study: column A empty, questions in B, answers in C
+    ws = wb.create_sheet('Desk study')
+    ws.append([None, 'Question', 'Answer'])
+    for column in EXCEL_SHEETS['Desk study'][1]:
+        # every answer filled in, an empty one would be dropped with its column
+        ws.append([None, field_name(column), _value(column, 0, rng) or f"{field_name(column)} from the desk study"])
+
+    ## Quadrat information, Vegetation and Photos: header row, data type row, records
+    for s in ['Quadrat information', 'Photos']:
+        columns = EXCEL_SHEETS[s][1]
+        ws = wb.create_sheet(s)
+        ws.append([field_name(c) for c in columns])
+        ws.append(_dtype_row(columns))
+        if s == 'Photos':
+            for i, row in enumerate(_record_rows(columns, quadrat_ids, rng, date)):
+                row[0] = f"{quadrat_ids[i]} photo"
+                ws.append(row)
+        else:
+            for row in _record_rows(columns, quadrat_ids, rng, date):
+                ws.append(row)
+
+    columns = EXCEL_SHEETS['Vegetation'][1]
+    ws = wb.create_sheet('Vegetation')
+    ws.append([field_name(c) for c in columns])
+    ws.append(_dtype_row(columns))
+    for point in quadrat_ids:
+        for name in rng.choice(SPECIES, size=min(species, len(SPECIES)), replace=False):
+            ws.append([point, name, round(float(rng.uniform(0, 100)), 1),
+                       None if rng.random() < 0.8 else 'flowering'])
+
+    ## Feature status sheets: title row, header row, data type row, records
+    for s in [s for s in EXCEL_SHEETS if s.startswith('Feature status')]:
+        columns = EXCEL_SHEETS[s][1]
+        ws = wb.create_sheet(s)
+        ws.append([s])
+        ws.append([field_name(c) for c in columns])
+        ws.append(_dtype_row(columns))
+        for row in _record_rows(columns, drain_ids, rng, date):
+            ws.append(row)
+
+    ## Area-level assessment: B2:C6, then B10:D30
+    ws = wb.create_sheet('Area-level assessment')
+    ws.append(['Area-level assessment'])
+    for column in AREA_MAIN:
+        ws.append([None, field_name(column), _value(column, 0, rng)])
+    for _ in range(3):
+        ws.append([])
+    for column in AREA_EXTRA:
+        ws.append([None, field_name(column), _value(column, 0, rng), f"{field_name(column)} seen across the site"])
+
+    wb.save(path)
+
+
+def write_monitoring_gpkg(path, rmn_id='MS01', quadrats=200, drains=300, fpp=20, seed=0):
+    """
+    Write a synthetic monitoring geopackage around a site in the Scottish Highlands.
+
+    sampling_point holds a planned and a field point per quadrat, and a second field
+    survey a year earlier for a tenth of them, so the reader's filters have work to do.
+    """
+    rng = np.random.default_rng(seed)
+    x0, y0 = 265000.0, 740000.0
+
+    ## monitoring area: a few overlapping blocks, dissolved by the reader
+    blocks = [shapely.box(x0 + i * 400, y0, x0 + i * 400 + 600, y0 + 1500) for i in range(4)]
+    area = gpd.GeoDataFrame({'name': [f"block {i + 1}" for i in range(4)]}, geometry=blocks, crs=27700)
+    area.to_file(path, layer='monitoring_area', driver='GPKG')
+
+    def points(n, z=True):
+        x = x0 + rng.uniform(0, 2000, n)
+        y = y0 + rng.uniform(0, 1500, n)
+        return shapely.points(x, y, rng.uniform(300, 900, n)) if z else shapely.points(x, y)
+
+    def gnss_columns(n):
+        return {
+            'horizontal_accuracy': rng.uniform(0.01, 2, n).round(2),
+            'vertical_accuracy': rng.uniform(0.01, 3, n).round(2),
+            'elevation': rng.uniform(300, 900, n).round(2),
+            'satellites': rng.integers(6, 20, n),
+            'gnss_height': rng.uniform(1, 2, n).round(2),
+        }
+
+    ids = sampling_point_ids(f"{rmn_id}_Q", quadrats)
+    older = ids[::10]
+    n = 2 * quadrats + len(older)
+    sampling = gpd.GeoDataFrame({
+        'sampling_point': ids + ids + older,
+        'source': ['planned'] * quadrats + ['field'] * (quadrats + len(older)),
+        'date': pd.to_datetime(['2024-07-15'] * (2 * quadrats) + ['2023-07-15'] * len(older)),
+        'feature_type': rng.choice(['drain', 'gully', 'hag', 'bare peat', 'intact'], n),
+        'corner': rng.choice(['NE', 'NW', 'SE', 'SW'], n),
+        **gnss_columns(n),
+    }, geometry=points(n), crs=27700)
+    sampling.to_file(path, layer='sampling_point', driver='GPKG')
+
+    drain_ids = sampling_point_ids(f"{rmn_id}_D", drains)
+    drain = gpd.GeoDataFrame({
+        'sampling_point': drain_ids,
+        'drain_point': [f"{d}_drain" for d in drain_ids],
+        'date': pd.to_datetime(['2024-07-15'] * drains),
+        **gnss_columns(drains),
+    }, geometry=points(drains), crs=27700)
+    drain.to_file(path, layer='drain_points', driver='GPKG')
+
+    fpp_geoms = points(fpp, z=False)
+    fpp_points = gpd.GeoDataFrame({
+        'easting': shapely.get_x(fpp_geoms).round(2),
+        'northing': shapely.get_y(fpp_geoms).round(2),
+        'bearing': rng.integers(0, 360, fpp),
+        'vertical_accuracy': rng.uniform(0.01, 3, fpp).round(2),
+        'camera_height': rng.integers(100, 200, fpp),
+    }, geometry=fpp_geoms, crs=27700)
+    fpp_points.to_file(path, layer='fpp_points', driver='GPKG')
+
+
+def write_mapping(path):
+    """Write the mapping workbook of the synthetic templates, in the layout of map/RMN data for database.xlsx"""
+    rows = []
+    for s, (table, columns) in EXCEL_SHEETS.items():
+        rows += [(s, field_name(c), c, table) for c in columns]
+    rows += [('Area-level assessment', field_name(c), c, 'area_level_assessment') for c in AREA_MAIN + AREA_EXTRA]
+    rows += [('Area-level assessment', field_name(c) + '_notes', c + '_notes', 'area_level_assessment')
+             for c in AREA_EXTRA]
+    for layer, (table, fields) in SPATIAL_LAYERS.items():
+        rows += [(layer, field, column, table) for field, column in fields]
+
+    map_df = pd.DataFrame(rows, columns=['Tab or geopackage layer', 'Field name', 'Field name for DB', 'Database layer'])
+    map_df['Upload to DB'] = 'Yes'
+    map_df.to_excel(path, index=False)
+
+
+def write_survey(out_dir, quadrats=200, species=12, drains=300, seed=0):
+    """
+    Write survey.xlsx, monitoring.gpkg and map.xlsx into out_dir.
+
+    Returns:
+        tuple: (workbook path, geopackage path, mapping path)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = tuple(os.path.join(out_dir, name) for name in ('survey.xlsx', 'monitoring.gpkg', 'map.xlsx'))
+    if os.path.exists(paths[1]):
+        os.remove(paths[1])  # layers would be appended to an old geopackage
+    write_survey_workbook(paths[0], quadrats=quadrats, species=species, drains=drains, seed=seed)
+    write_monitoring_gpkg(paths[1], quadrats=quadrats, drains=drains, seed=seed)
+    write_mapping(paths[2])
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic RMN survey workbook, geopackage and mapping.")
+    parser.add_argument('out_dir', type=str, help="Folder for survey.xlsx, monitoring.gpkg and map.xlsx")
+    parser.add_argument('--quadrats', type=int, default=200, help="Quadrats in the survey")
+    parser.add_argument('--species', type=int, default=12, help="Vegetation rows per quadrat")
+    parser.add_argument('--drains', type=int, default=300, help="Points in each Feature status sheet and drain_points")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    for path in write_survey(args.out_dir, args.quadrats, args.species, args.drains, args.seed):
+        print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
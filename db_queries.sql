@@ -369,3 +369,67 @@ CREATE TABLE pa_restoration_monitoring_network.fpp_points (
 
 
 
+
+
+-- natural keys, used by the merge load method (INSERT ... ON CONFLICT) and by the duplicate survey check.
+-- entry numbers the rows of a survey repeating the rest of the key, NULLs in a key count as equal
+-- (PostgreSQL 15 or later), see migrations/0004
+ALTER TABLE pa_restoration_monitoring_network.desk_study
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT desk_study_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, entry);
+ALTER TABLE pa_restoration_monitoring_network.area_level_assessment
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT area_level_assessment_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, entry);
+ALTER TABLE pa_restoration_monitoring_network.monitoring_area
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT monitoring_area_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, entry);
+ALTER TABLE pa_restoration_monitoring_network.quadrat_information
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT quadrat_information_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, entry);
+ALTER TABLE pa_restoration_monitoring_network.vegetation
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT vegetation_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, species, entry);
+ALTER TABLE pa_restoration_monitoring_network.photos
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT photos_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, title, entry);
+ALTER TABLE pa_restoration_monitoring_network.feature_status_drains
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT feature_status_drains_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, entry);
+ALTER TABLE pa_restoration_monitoring_network.feature_status_gullies
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT feature_status_gullies_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, entry);
+ALTER TABLE pa_restoration_monitoring_network.feature_status_hags
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT feature_status_hags_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, entry);
+ALTER TABLE pa_restoration_monitoring_network.feature_status_bare_peat
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT feature_status_bare_peat_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, entry);
+ALTER TABLE pa_restoration_monitoring_network.feature_status_forest_to_bog
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT feature_status_forest_to_bog_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, entry);
+ALTER TABLE pa_restoration_monitoring_network.sampling_points
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT sampling_points_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point_id, entry);
+ALTER TABLE pa_restoration_monitoring_network.drain_points
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT drain_points_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, drain_point_id, entry);
+ALTER TABLE pa_restoration_monitoring_network.fpp_points
+    ADD COLUMN entry INT NOT NULL DEFAULT 1,
+    ADD CONSTRAINT fpp_points_key UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, easting, northing, bearing, entry);
+
+
+-- survey lookup of the duplicate survey check, on any PostgreSQL version (migrations/0005)
+CREATE INDEX desk_study_survey_idx ON pa_restoration_monitoring_network.desk_study (rmn_id, grant_id, visit);
+CREATE INDEX area_level_assessment_survey_idx ON pa_restoration_monitoring_network.area_level_assessment (rmn_id, grant_id, visit);
+CREATE INDEX monitoring_area_survey_idx ON pa_restoration_monitoring_network.monitoring_area (rmn_id, grant_id, visit);
+CREATE INDEX quadrat_information_survey_idx ON pa_restoration_monitoring_network.quadrat_information (rmn_id, grant_id, visit);
+CREATE INDEX vegetation_survey_idx ON pa_restoration_monitoring_network.vegetation (rmn_id, grant_id, visit);
+CREATE INDEX photos_survey_idx ON pa_restoration_monitoring_network.photos (rmn_id, grant_id, visit);
+CREATE INDEX feature_status_drains_survey_idx ON pa_restoration_monitoring_network.feature_status_drains (rmn_id, grant_id, visit);
+CREATE INDEX feature_status_gullies_survey_idx ON pa_restoration_monitoring_network.feature_status_gullies (rmn_id, grant_id, visit);
+CREATE INDEX feature_status_hags_survey_idx ON pa_restoration_monitoring_network.feature_status_hags (rmn_id, grant_id, visit);
+CREATE INDEX feature_status_bare_peat_survey_idx ON pa_restoration_monitoring_network.feature_status_bare_peat (rmn_id, grant_id, visit);
+CREATE INDEX feature_status_forest_to_bog_survey_idx ON pa_restoration_monitoring_network.feature_status_forest_to_bog (rmn_id, grant_id, visit);
+CREATE INDEX sampling_points_survey_idx ON pa_restoration_monitoring_network.sampling_points (rmn_id, grant_id, visit);
+CREATE INDEX drain_points_survey_idx ON pa_restoration_monitoring_network.drain_points (rmn_id, grant_id, visit);
+CREATE INDEX fpp_points_survey_idx ON pa_restoration_monitoring_network.fpp_points (rmn_id, grant_id, visit);
@@ -4,16 +4,20 @@ adding the relevant grant ID at the same time - any constraint failures will be
 """
 
 import argparse
+import time
 
 import psycopg2
+import psycopg2.extras as extras
 from osgeo import ogr
 from psycopg2 import sql
 
 from config import config
+from rmn_etl.db import connect
+from rmn_etl.metrics import peak_rss_mb
 
 
 def connect_postgres():
-    """Connect to the PostgreSQL database server"""
+    """Connect to the PostgreSQL database server, with the connection settings of rmn_etl.db"""
     conn = None
     try:
 
@@ -22,7 +26,7 @@ def connect_postgres():
 
         # connect to the PostgreSQL server
         print("Connecting to the PostgreSQL database...")
-        conn = psycopg2.connect(**params)
+        conn = connect(params)
 
         return conn
 
@@ -55,52 +59,77 @@ def create_field_list(layer, schema_name):
     return field_list
 
 
-def create_values_string(layer, grant_id):
-    values_string = ""
+def feature_values(feature, has_geometry, grant_id):
+    """Return the parameters for one feature: geometry as WKB, then each field, then the grant_id"""
+    values = []
+
+    if has_geometry:
+        geom = feature.GetGeometryRef()
+        values.append(psycopg2.Binary(geom.ExportToWkb()) if geom is not None else None)
+
+    for key in feature.keys():
+        # Get the value for each field and add it to the values array:
+
+        fld_defn = feature.GetFieldDefnRef(feature.GetFieldIndex(key))
+        if (
+            fld_defn.GetType() == ogr.OFTInteger
+            and fld_defn.GetSubType() == ogr.OFSTBoolean
+        ):
+            val = bool(feature.GetField(key))
+        else:
+            val = feature.GetField(key)
+        values.append(val)
+
+    # add the grant_id to the feature
+    values.append(grant_id)
+    return tuple(values)
+
+
+def iter_feature_chunks(layer, grant_id, chunk_size=5000):
+    """
+    Read the features of a layer in chunks of parameter tuples, so only one chunk
+    is held in memory at a time whatever the size of the layer.
+    """
+    has_geometry = layer.GetGeometryColumn() != ""
+    chunk = []
+
+    layer.ResetReading()
+    # (**can't use the indexed GetFeature(fid) as the fid does not necessarily start at 1 and increment by 1)
+    feature = layer.GetNextFeature()
+    while feature is not None:
+        chunk.append(feature_values(feature, has_geometry, grant_id))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+        feature = layer.GetNextFeature()
 
-    # for each feature
-    for j in range(1, layer.GetFeatureCount() + 1):
+    if chunk:
+        yield chunk
 
-        values = []
-        # get the next feature (**can't use the indexed GetNextFeature(fid) as the fid does not necessarily start at
-        # 1 and increment by 1)
-        feature = layer.GetNextFeature()
 
-        # check it's not null
-        if feature is not None:
+def create_values_template(layer, field_list):
+    """Placeholders for one row, the geometry is passed as WKB and set to EPSG:27700"""
+    placeholders = ["%s"] * len(field_list)
+    if layer.GetGeometryColumn() != "":
+        placeholders[0] = "st_geomfromwkb(%s,27700)"
+    return "(" + ",".join(placeholders) + ")"
 
-            geom = feature.GetGeometryRef()
-            if geom is not None:
-                values += ["st_geomfromtext('" + str(geom) + "',27700)"]
 
-            for key in feature.keys():
-                # Get the value for each field and add it to the values array:
+def insert_layer(cur, layer, schema_name, table_name, field_list, grant_id, chunk_size=5000):
+    """
+    Stream the features of a layer into schema_name.table_name, one bound INSERT per chunk.
 
-                fld_defn = feature.GetFieldDefnRef(feature.GetFieldIndex(key))
-                if (
-                    fld_defn.GetType() == ogr.OFTInteger
-                    and fld_defn.GetSubType() == ogr.OFSTBoolean
-                ):
-                    val = bool(feature.GetField(key))
-                else:
-                    val = feature.GetField(key)
-
-                # Postgres strings must be enclosed with single quotes
-                if type(val) == str:
-                    # escape apostrophes with two single quotations
-                    val = val.replace("'", "''")  # type: ignore
-                    val = "'" + val + "'"
-                if val is None:
-                    val = "NULL"
-
-                values += [str(val)]
-            # add the grant_id to the feature
-            values += ["'" + grant_id + "'"]
-            # make a string surrounded by brackets for each feature's values
-            values_string += "(" + ",".join(values) + "),\n"
-    # remove the last comma and replace with a semi-colon - the end of the sql query
-    values_string = values_string[:-2] + ";"
-    return values_string
+    Returns:
+        int: Number of features inserted.
+    """
+    query = "INSERT INTO {}.{} ({}) VALUES %s".format(schema_name, table_name, ",".join(field_list))
+    template = create_values_template(layer, field_list)
+
+    inserted = 0
+    for chunk in iter_feature_chunks(layer, grant_id, chunk_size):
+        extras.execute_values(cur, query, chunk, template=template, page_size=len(chunk))
+        inserted += len(chunk)
+    return inserted
 
 
 def main():
@@ -124,6 +153,9 @@ def main():
     parser.add_argument(
         "-y", "--year_end", required=False, help="The financial year end of the project"
     )
+    parser.add_argument(
+        "--chunk_size", type=int, default=5000, help="Features read and sent to the database per batch"
+    )
 
     args = parser.parse_args()
 
@@ -224,19 +256,21 @@ def main():
                         # Get the list of fields for the layer:
                         field_list = create_field_list(layer, schema_name)
                         # Get the features from the layer and insert them into the database, adding in grant ref:
-
-                        values_string = create_values_string(layer, grant_id)
-
-                        sql_string = cur.mogrify(
-                            "INSERT INTO {}.{} ({})\n VALUES {}".format(
-                                schema_name,
+                        start = time.perf_counter()
+                        inserted = insert_layer(
+                            cur, layer, schema_name, table_name, field_list, grant_id, args.chunk_size
+                        )
+                        elapsed = time.perf_counter() - start
+                        peak = peak_rss_mb()
+                        print(
+                            "Layer {} inserted: {} features in {:.2f} s ({:.0f} features/s), peak RSS {}".format(
                                 table_name,
-                                ",".join(field_list),
-                                values_string,
+                                inserted,
+                                elapsed,
+                                inserted / elapsed if elapsed else 0,
+                                "{:.0f} MB".format(peak) if peak is not None else "n/a",
                             )
                         )
-                        # print(sql_string)
-                        cur.execute(sql_string)
 
         # with pg_conn:
         #    with pg_conn.cursor() as cur:
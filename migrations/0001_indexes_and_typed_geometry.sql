@@ -0,0 +1,80 @@
+-- 0001: keys, indexes and typed geometry columns for pa_restoration_monitoring_network
+--
+-- Applied once, in a transaction, by: python -m rmn_etl.migrations
+-- Safe on databases created from db_queries.sql before or after the UNIQUE keys were added.
+
+
+-- natural keys (essential: the duplicate survey check and the merge load method use them).
+-- Each is a B-tree starting with (rmn_id, grant_id, visit[, sampling_point]), so the survey
+-- lookup is an index probe instead of a sequential scan.
+DO $$
+DECLARE
+    k record;
+BEGIN
+    FOR k IN SELECT * FROM (VALUES
+        ('desk_study', 'rmn_id, grant_id, visit'),
+        ('area_level_assessment', 'rmn_id, grant_id, visit'),
+        ('monitoring_area', 'rmn_id, grant_id, visit'),
+        ('quadrat_information', 'rmn_id, grant_id, visit, sampling_point'),
+        ('vegetation', 'rmn_id, grant_id, visit, sampling_point, species'),
+        ('photos', 'rmn_id, grant_id, visit, title'),
+        ('feature_status_drains', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_gullies', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_hags', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_bare_peat', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_forest_to_bog', 'rmn_id, grant_id, visit, sampling_point'),
+        ('sampling_points', 'rmn_id, grant_id, visit, sampling_point_id'),
+        ('drain_points', 'rmn_id, grant_id, visit, drain_point_id'),
+        ('fpp_points', 'rmn_id, grant_id, visit, easting, northing, bearing')
+    ) AS keys (table_name, key_columns)
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = k.table_name || '_key'
+              AND connamespace = 'pa_restoration_monitoring_network'::regnamespace
+        ) THEN
+            EXECUTE format('ALTER TABLE pa_restoration_monitoring_network.%I ADD CONSTRAINT %I UNIQUE (%s)',
+                           k.table_name, k.table_name || '_key', k.key_columns);
+        END IF;
+    END LOOP;
+END $$;
+
+
+-- typed geometry columns in British National Grid
+ALTER TABLE pa_restoration_monitoring_network.monitoring_area
+    ALTER COLUMN geometry TYPE geometry(MultiPolygon, 27700)
+    USING ST_Multi(CASE WHEN ST_SRID(geometry) = 0 THEN ST_SetSRID(geometry, 27700) ELSE geometry END);
+
+ALTER TABLE pa_restoration_monitoring_network.sampling_points
+    ADD COLUMN IF NOT EXISTS geometry geometry(Point, 27700);
+
+ALTER TABLE pa_restoration_monitoring_network.drain_points
+    ADD COLUMN IF NOT EXISTS geometry geometry(Point, 27700);
+
+
+-- spatial indexes (non-essential: dropped and rebuilt around bulk loads, see rmn_etl.indexes)
+CREATE INDEX IF NOT EXISTS monitoring_area_geometry_gist
+    ON pa_restoration_monitoring_network.monitoring_area USING gist (geometry);
+CREATE INDEX IF NOT EXISTS sampling_points_geometry_gist
+    ON pa_restoration_monitoring_network.sampling_points USING gist (geometry);
+CREATE INDEX IF NOT EXISTS drain_points_geometry_gist
+    ON pa_restoration_monitoring_network.drain_points USING gist (geometry);
+
+
+-- analyst access paths (non-essential): one sampling point across visits, one species across sites
+CREATE INDEX IF NOT EXISTS quadrat_information_sampling_point_idx
+    ON pa_restoration_monitoring_network.quadrat_information (rmn_id, sampling_point);
+CREATE INDEX IF NOT EXISTS vegetation_sampling_point_idx
+    ON pa_restoration_monitoring_network.vegetation (rmn_id, sampling_point);
+CREATE INDEX IF NOT EXISTS vegetation_species_idx
+    ON pa_restoration_monitoring_network.vegetation (species);
+CREATE INDEX IF NOT EXISTS feature_status_drains_sampling_point_idx
+    ON pa_restoration_monitoring_network.feature_status_drains (rmn_id, sampling_point);
+CREATE INDEX IF NOT EXISTS feature_status_gullies_sampling_point_idx
+    ON pa_restoration_monitoring_network.feature_status_gullies (rmn_id, sampling_point);
+CREATE INDEX IF NOT EXISTS feature_status_hags_sampling_point_idx
+    ON pa_restoration_monitoring_network.feature_status_hags (rmn_id, sampling_point);
+CREATE INDEX IF NOT EXISTS feature_status_bare_peat_sampling_point_idx
+    ON pa_restoration_monitoring_network.feature_status_bare_peat (rmn_id, sampling_point);
+CREATE INDEX IF NOT EXISTS feature_status_forest_to_bog_sampling_point_idx
+    ON pa_restoration_monitoring_network.feature_status_forest_to_bog (rmn_id, sampling_point);
@@ -0,0 +1,25 @@
+-- 0002: ledger of the files imported into pa_restoration_monitoring_network
+--
+-- One row per successful import of a survey file (see rmn_etl.ledger). A rerun compares the file's
+-- size, modification time and content hash with the last row of its survey and skips it when
+-- nothing changed, or reprocesses only the sheets/layers whose part hash changed.
+
+CREATE TABLE IF NOT EXISTS pa_restoration_monitoring_network.import_ledger (
+    id SERIAL PRIMARY KEY,
+    rmn_id VARCHAR(10) NOT NULL,
+    grant_id VARCHAR(10) NOT NULL,
+    visit VARCHAR(50) NOT NULL,
+    kind VARCHAR(10) NOT NULL,  -- excel or spatial
+    file_path VARCHAR NOT NULL,
+    file_size BIGINT NOT NULL,
+    file_mtime DOUBLE PRECISION NOT NULL,
+    file_sha256 CHAR(64) NOT NULL,
+    mapping_version CHAR(64),
+    part_hashes JSONB NOT NULL,  -- {sheet or layer: hash}
+    row_counts JSONB NOT NULL,  -- {table: rows loaded}
+    duration_s DOUBLE PRECISION,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS import_ledger_survey_idx
+    ON pa_restoration_monitoring_network.import_ledger (rmn_id, grant_id, visit, kind, id DESC);
@@ -0,0 +1,7 @@
+-- 0003: per-sheet frame hashes in the import ledger
+--
+-- Hash of every prepared sheet/layer frame as last loaded (see rmn_etl.ledger.frame_hash). A rerun
+-- skips the sheets whose frame did not change, before the remap, and reloads only the others.
+
+ALTER TABLE pa_restoration_monitoring_network.import_ledger
+    ADD COLUMN IF NOT EXISTS frame_hashes JSONB NOT NULL DEFAULT '{}';  -- {sheet or layer: hash}
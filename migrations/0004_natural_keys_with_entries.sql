@@ -0,0 +1,51 @@
+-- 0004: natural keys that allow repeats and NULLs (needs PostgreSQL 15 or later)
+--
+-- Applied once, in a transaction, by: python -m rmn_etl.migrations
+--
+-- A survey can legitimately repeat a key, for example the same species recorded twice in one
+-- quadrat, and key columns such as species, title or sampling_point can be NULL. So every keyed
+-- table gets an entry column numbering the rows of a survey that share the rest of the key (1, 2, ...,
+-- set by rmn_etl.loader.number_entries on load). The key becomes UNIQUE NULLS NOT DISTINCT
+-- (..., entry), so ON CONFLICT also matches rows with a NULL in the key and a corrected
+-- resubmission merged with --load-method merge updates them instead of adding them again.
+--
+-- Rows already in the database are numbered here, in physical order, so existing repeats do
+-- not stop the migration. Exact duplicates left by a survey loaded twice are numbered too.
+-- Delete them first if they are not wanted (see "Schema migrations" in the Readme).
+--
+-- Each key is a B-tree starting with (rmn_id, grant_id, visit), so the duplicate survey check
+-- is an index probe instead of a sequential scan.
+DO $$
+DECLARE
+    k record;
+BEGIN
+    FOR k IN SELECT * FROM (VALUES
+        ('desk_study', 'rmn_id, grant_id, visit'),
+        ('area_level_assessment', 'rmn_id, grant_id, visit'),
+        ('monitoring_area', 'rmn_id, grant_id, visit'),
+        ('quadrat_information', 'rmn_id, grant_id, visit, sampling_point'),
+        ('vegetation', 'rmn_id, grant_id, visit, sampling_point, species'),
+        ('photos', 'rmn_id, grant_id, visit, title'),
+        ('feature_status_drains', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_gullies', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_hags', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_bare_peat', 'rmn_id, grant_id, visit, sampling_point'),
+        ('feature_status_forest_to_bog', 'rmn_id, grant_id, visit, sampling_point'),
+        ('sampling_points', 'rmn_id, grant_id, visit, sampling_point_id'),
+        ('drain_points', 'rmn_id, grant_id, visit, drain_point_id'),
+        ('fpp_points', 'rmn_id, grant_id, visit, easting, northing, bearing')
+    ) AS keys (table_name, key_columns)
+    LOOP
+        EXECUTE format('ALTER TABLE pa_restoration_monitoring_network.%I '
+                       'ADD COLUMN IF NOT EXISTS entry INT NOT NULL DEFAULT 1', k.table_name);
+        EXECUTE format('ALTER TABLE pa_restoration_monitoring_network.%I DROP CONSTRAINT IF EXISTS %I',
+                       k.table_name, k.table_name || '_key');
+        EXECUTE format('UPDATE pa_restoration_monitoring_network.%1$I t SET entry = n.entry '
+                       'FROM (SELECT ctid, row_number() OVER (PARTITION BY %2$s ORDER BY entry, ctid) AS entry '
+                       '      FROM pa_restoration_monitoring_network.%1$I) n '
+                       'WHERE t.ctid = n.ctid AND t.entry <> n.entry', k.table_name, k.key_columns);
+        EXECUTE format('ALTER TABLE pa_restoration_monitoring_network.%I '
+                       'ADD CONSTRAINT %I UNIQUE NULLS NOT DISTINCT (%s, entry)',
+                       k.table_name, k.table_name || '_key', k.key_columns);
+    END LOOP;
+END $$;
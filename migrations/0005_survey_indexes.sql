@@ -0,0 +1,35 @@
+-- 0005: plain (rmn_id, grant_id, visit) index on every target table
+--
+-- Applied once, in a transaction, by: python -m rmn_etl.migrations
+--
+-- The duplicate survey check (rmn_etl.dedupe.find_existing_tables) looks a survey up by these
+-- three columns only. These indexes serve it on any PostgreSQL version, whatever natural keys the
+-- table has. They are essential: rmn_etl.indexes never drops a *_survey_idx around a bulk load.
+CREATE INDEX IF NOT EXISTS desk_study_survey_idx
+    ON pa_restoration_monitoring_network.desk_study (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS area_level_assessment_survey_idx
+    ON pa_restoration_monitoring_network.area_level_assessment (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS monitoring_area_survey_idx
+    ON pa_restoration_monitoring_network.monitoring_area (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS quadrat_information_survey_idx
+    ON pa_restoration_monitoring_network.quadrat_information (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS vegetation_survey_idx
+    ON pa_restoration_monitoring_network.vegetation (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS photos_survey_idx
+    ON pa_restoration_monitoring_network.photos (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS feature_status_drains_survey_idx
+    ON pa_restoration_monitoring_network.feature_status_drains (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS feature_status_gullies_survey_idx
+    ON pa_restoration_monitoring_network.feature_status_gullies (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS feature_status_hags_survey_idx
+    ON pa_restoration_monitoring_network.feature_status_hags (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS feature_status_bare_peat_survey_idx
+    ON pa_restoration_monitoring_network.feature_status_bare_peat (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS feature_status_forest_to_bog_survey_idx
+    ON pa_restoration_monitoring_network.feature_status_forest_to_bog (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS sampling_points_survey_idx
+    ON pa_restoration_monitoring_network.sampling_points (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS drain_points_survey_idx
+    ON pa_restoration_monitoring_network.drain_points (rmn_id, grant_id, visit);
+CREATE INDEX IF NOT EXISTS fpp_points_survey_idx
+    ON pa_restoration_monitoring_network.fpp_points (rmn_id, grant_id, visit);
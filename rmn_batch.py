@@ -0,0 +1,219 @@
+"""
+Run the RMN Excel and spatial readers for many surveys listed in a manifest.
+
+The manifest is a CSV file with one survey per row:
+
+    rmn_id,grant_id,visit,excel_path,gpkg_path
+    MS01,502418,1-year,C:\\...\\MS01 1-year excel.xlsx,C:\\...\\monitoring.gpkg
+
+Surveys are processed concurrently in a process pool. The mapping is compiled
+once and shared with every worker, and each worker keeps a small connection
+pool for all the surveys it processes. Within each survey the Excel and
+spatial halves run in parallel, unless --atomic, --replace or --dry-run ask
+for one transaction per survey: both halves then run one after the other on
+the same connection and the survey is committed only if every table loaded.
+Either path can be left blank to run only one half. The batch finishes with a summary table of timing and rows loaded
+per survey.
+
+example: python rmn_batch.py surveys.csv -j 4
+"""
+
+import os
+import time
+import argparse
+from contextlib import nullcontext, redirect_stdout
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from rmn_etl.db import connect, create_pool
+from rmn_etl.excel import load_excel_survey
+from rmn_etl.indexes import indexes_dropped
+from rmn_etl.loader import LOAD_METHODS, DatabaseSink
+from rmn_etl.mapping import load_mapping
+from rmn_etl.metrics import RunMetrics, write_report
+from rmn_etl.spatial import load_spatial_survey
+from rmn_etl.trace import Tracer
+
+
+MANIFEST_COLUMNS = ['rmn_id', 'grant_id', 'visit', 'excel_path', 'gpkg_path']
+KEY_COLUMNS = ['rmn_id', 'grant_id', 'visit']
+
+## state of each worker process, set once by init_worker
+_mapping = None
+_pool = None
+
+
+def read_manifest(path):
+    """Read the manifest, blank paths become empty strings"""
+    manifest = pd.read_csv(path, dtype=str, keep_default_na=False)
+    missing = [c for c in MANIFEST_COLUMNS if c not in manifest.columns]
+    if missing:
+        raise ValueError(f"Manifest {path} is missing the columns {missing}")
+    return manifest[MANIFEST_COLUMNS].to_dict('records')
+
+
+def init_worker(mapping):
+    """Keep the compiled mapping and open the connection pool of this worker"""
+    global _mapping, _pool
+    pd.options.mode.chained_assignment = None  # default='warn'
+    _mapping = mapping
+    _pool = create_pool(minconn=1, maxconn=2)  # one connection for each half of a survey
+
+
+def run_half(load, survey, path, load_method, trace_dir=None, kind='', sink=None, report=False, ledger=False,
+             validate=False):
+    """
+    Load one half of a survey with a connection borrowed from the worker pool,
+    or into the survey transaction of sink when one is given.
+
+    Returns:
+        tuple: (status, seconds, rows loaded, stage report or None)
+    """
+    if not path:
+        return 'skipped', 0.0, 0, None
+    if not os.path.exists(path):
+        return 'missing file', 0.0, 0, None
+
+    start = time.perf_counter()
+    conn = _pool.getconn() if sink is None else None
+    label = "_".join([survey[c] for c in KEY_COLUMNS] + [kind])
+    trace = Tracer(trace_dir, label=label)
+    # tracemalloc is process wide and the halves may run side by side, so no per-stage memory here
+    metrics = RunMetrics(label, enabled=report, track_memory=False)
+    try:
+        rows = load(path, survey['rmn_id'], survey['grant_id'], survey['visit'],
+                    conn=conn, sink=sink, mapping=_mapping, load_method=load_method, trace=trace, metrics=metrics,
+                    ledger=ledger, validate=validate)
+        status = 'ok'
+    except Exception as e:
+        rows = {}
+        status = f'failed: {e}'
+    finally:
+        trace.close()
+        if conn is not None:
+            _pool.putconn(conn)
+
+    return status, time.perf_counter() - start, sum(rows.values()), metrics.report() if report else None
+
+
+def run_atomic_survey(survey, load_method, trace_dir, replace, dry_run, report=False, ledger=False, load_excel=load_excel_survey,
+                      validate=False, load_spatial=load_spatial_survey):
+    """
+    Run both halves of a survey on one connection, in one transaction.
+
+    Returns:
+        tuple: (excel result, spatial result, transaction status)
+    """
+    conn = _pool.getconn()
+    try:
+        sink = DatabaseSink(conn, _mapping.tables, [survey[c] for c in KEY_COLUMNS], method=load_method,
+                            atomic=True, replace=replace, dry_run=dry_run, validate=validate)
+        excel = run_half(load_excel, survey, survey['excel_path'], load_method, trace_dir, 'excel', sink, report, ledger)
+        spatial = run_half(load_spatial, survey, survey['gpkg_path'], load_method, trace_dir, 'spatial', sink, report, ledger)
+        if excel[0].startswith('failed') or spatial[0].startswith('failed'):
+            sink.abort()
+            transaction = 'rolled back'
+        else:
+            transaction = 'committed' if sink.finish() else 'rolled back'
+    except Exception as e:
+        conn.rollback()
+        excel = spatial = ('not run', 0.0, 0, None)
+        transaction = f'failed: {e}'
+    finally:
+        _pool.putconn(conn)
+    return excel, spatial, transaction
+
+
+def run_survey(survey, log_dir, load_method, trace_dir=None, atomic=False, replace=False, dry_run=False, report=False,
+               ledger=False, chunk_rows=None, validate=False, overlap=False):
+    """
+    Run the Excel and spatial halves of a survey, writing their output to a log file.
+
+    Returns:
+        tuple: (summary row, stage reports of the halves)
+    """
+    name = "_".join(survey[c] for c in KEY_COLUMNS)
+    load_excel = partial(load_excel_survey, chunk_rows=chunk_rows, overlap=overlap)
+    load_spatial = partial(load_spatial_survey, overlap=overlap)
+    start = time.perf_counter()
+    transaction = None
+
+    with open(os.path.join(log_dir, f"{name}.log"), 'w') as log, redirect_stdout(log):
+        if atomic or replace or dry_run:
+            excel, spatial, transaction = run_atomic_survey(survey, load_method, trace_dir, replace, dry_run, report, ledger, load_excel,
+                                                            validate, load_spatial)
+        else:
+            with ThreadPoolExecutor(max_workers=2) as halves:
+                excel = halves.submit(run_half, load_excel, survey, survey['excel_path'], load_method, trace_dir, 'excel', None, report, ledger, validate)
+                spatial = halves.submit(run_half, load_spatial, survey, survey['gpkg_path'], load_method, trace_dir, 'spatial', None, report, ledger, validate)
+                excel, spatial = excel.result(), spatial.result()
+
+    excel_status, excel_time, excel_rows, excel_report = excel
+    spatial_status, spatial_time, spatial_rows, spatial_report = spatial
+    result = {
+        'survey': name,
+        'excel': excel_status,
+        'excel_s': round(excel_time, 1),
+        'spatial': spatial_status,
+        'spatial_s': round(spatial_time, 1),
+        'total_s': round(time.perf_counter() - start, 1),
+        'rows_loaded': excel_rows + spatial_rows,
+    }
+    if transaction is not None:
+        result['transaction'] = transaction
+    return result, [r for r in (excel_report, spatial_report) if r is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load many RMN surveys listed in a manifest.")
+    parser.add_argument('manifest', type=str, help="CSV with rmn_id, grant_id, visit, excel_path, gpkg_path")
+    parser.add_argument('-j', '--jobs', type=int, default=4, help="Surveys processed at the same time")
+    parser.add_argument('--log-dir', type=str, default='batch_logs', help="Folder for the output of each survey")
+    parser.add_argument('--load-method', type=str, choices=LOAD_METHODS, default="copy", help="How tables are pushed: COPY (default), INSERT, or MERGE (upsert on the natural keys)")
+    parser.add_argument('--atomic', action='store_true', help="One transaction per survey, committed only if every table loads")
+    parser.add_argument('--replace', action='store_true', help="Delete each survey from the tables and load it again, in one transaction")
+    parser.add_argument('--dry-run', action='store_true', help="Load every survey in its own transaction, then roll it back")
+    parser.add_argument('--ledger', action='store_true', help="Skip files unchanged since their last import, reprocess only the changed sheets or layers of the others (import ledger)")
+    parser.add_argument('--chunk-rows', type=int, default=None, help="Stream the Vegetation and Photos sheets in chunks of this many rows, to keep each worker's memory flat")
+    parser.add_argument('--validate', action='store_true', help="Check the mapping and every table against the database columns before pushing")
+    parser.add_argument('--overlap', action='store_true', help="Prepare the next sheet or layer of a survey while the current one is pushed, for a distant database")
+    parser.add_argument('--drop-indexes', action='store_true', help="Drop the non-essential indexes for the batch and rebuild them at the end")
+    parser.add_argument('--report', type=str, default=None, help="Write a JSON report of time, rows and bytes of every stage of every survey here")
+    parser.add_argument('--trace-dir', type=str, default=None, help="Write Parquet snapshots of the intermediate tables here (debugging, off by default)")
+    args = parser.parse_args()
+
+    surveys = read_manifest(args.manifest)
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    ## the map is compiled once here and handed to every worker
+    mapping = load_mapping()
+
+    start = time.perf_counter()
+    index_conn = connect() if args.drop_indexes else None
+    try:
+        with indexes_dropped(index_conn, mapping.tables) if index_conn else nullcontext():
+            with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker, initargs=(mapping,)) as pool:
+                futures = [pool.submit(run_survey, s, args.log_dir, args.load_method, args.trace_dir,
+                                       args.atomic, args.replace, args.dry_run, args.report is not None, args.ledger, args.chunk_rows,
+                                       args.validate, args.overlap)
+                           for s in surveys]
+                results, reports = [], []
+                for f in futures:
+                    result, survey_reports = f.result()
+                    results.append(result)
+                    reports.extend(survey_reports)
+    finally:
+        if index_conn:
+            index_conn.close()
+    elapsed = time.perf_counter() - start
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.report:
+        write_report(args.report, reports)
+    print(f"\n{len(surveys)} surveys in {elapsed:.1f} s, reader output in {args.log_dir}")
+
+
+if __name__ == "__main__":
+    main()
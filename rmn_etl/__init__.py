@@ -0,0 +1,7 @@
+"""
+Shared building blocks for the RMN (Restoration Monitoring Network) readers.
+
+The command line scripts at the top of the repository
+(rmn_excel_template_reader.py and rmn_spatial_template_reader.py)
+import from here so the heavy lifting lives in one place.
+"""
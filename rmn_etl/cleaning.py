@@ -0,0 +1,95 @@
+"""
+Column-wise cell normalisation shared by the RMN readers.
+
+Replaces the per-cell applymap/replace passes with vectorized operations
+over whole columns:
+
+    "NA" (ignoring surrounding spaces)  ->  "Not Applicable"
+    empty string / NaN / None           ->  None
+    white-space only string / NaT       ->  None   (database stage only)
+
+Survey columns repeat a handful of values (species, yes/no answers, "NA"),
+so each column is factorized and the string tests run once per distinct
+value instead of once per cell.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _factorize(col):
+    """
+    Factorize an object column.
+
+    Returns:
+        tuple: (codes, uniques, stripped) where codes is -1 for missing cells,
+               and stripped holds the stripped text of each distinct string (None for non-strings).
+    """
+    codes, uniques = pd.factorize(col, use_na_sentinel=True)
+    uniques = np.asarray(uniques, dtype=object)
+    stripped = np.array([u.strip() if isinstance(u, str) else None for u in uniques], dtype=object)
+    return codes, uniques, stripped
+
+
+def _per_cell(codes, flags):
+    """Broadcast a flag per distinct value back to every cell (missing cells are False)."""
+    return np.append(flags.astype(bool), False)[codes]
+
+
+def normalise_cells(df):
+    """
+    Sheet stage: keep 'NA' as "Not Applicable" and turn empty cells into None.
+
+    Gives the same frame as the two applymap passes it replaces:
+        df.applymap(lambda x: "Not Applicable" if isinstance(x,str) and x.strip() == "NA" else x)
+        df.applymap(lambda x: None if x in [np.nan, None, ""] else x)
+    Only object columns can hold strings or None, so numeric and datetime
+    columns are passed through untouched.
+
+    Parameters:
+        df (DataFrame): Sheet as read from the workbook.
+
+    Returns:
+        DataFrame: New frame with the normalised columns.
+    """
+    out = df.copy(deep=False)
+    for i, (name, col) in enumerate(df.items()):
+        if col.dtype != object:
+            continue
+        codes, uniques, stripped = _factorize(col)
+        values = col.to_numpy(copy=True)
+        values[_per_cell(codes, stripped == "NA")] = "Not Applicable"
+        values[_per_cell(codes, uniques == "") | (codes == -1)] = None
+        # let pandas re-infer the dtype like applymap did
+        out.isetitem(i, pd.Series(values, index=col.index, name=name).infer_objects())
+
+    return out
+
+
+def to_db_nulls(df):
+    """
+    Database stage: white-space only strings, NaN, NaT and pd.NA become None (NULL).
+
+    Gives the same frame as the two replace passes it replaces:
+        df.replace('^\\s*$', np.nan, regex=True)
+        df.replace({np.nan: None})
+
+    Parameters:
+        df (DataFrame): Remapped frame about to be pushed to the database.
+
+    Returns:
+        DataFrame: New frame where every missing value is None.
+    """
+    out = df.copy(deep=False)
+    for i, (name, col) in enumerate(df.items()):
+        if col.dtype == object:
+            codes, uniques, stripped = _factorize(col)
+            to_null = _per_cell(codes, stripped == "") | (codes == -1)
+        else:
+            to_null = col.isna().to_numpy()
+        if to_null.any():
+            values = col.to_numpy(dtype=object, copy=True)
+            values[to_null] = None
+            out.isetitem(i, pd.Series(values, index=col.index, name=name, dtype=object))
+
+    return out
@@ -0,0 +1,135 @@
+"""
+Database connections for the RMN loaders.
+
+Every entry point connects through here, so all connections get the same
+settings on top of the credentials in config.py:
+
+    TCP keepalives       a long load behind a NAT or firewall is not dropped silently
+    application_name     the loaders can be told apart in pg_stat_activity
+    statement_timeout    from config.statement_timeout (e.g. '15min'), none when not set
+
+Long-running processes (the rmn_batch.py workers) borrow connections from a
+ConnectionPool, which checks a connection before lending it, and repeated
+queries can run as server-side prepared statements (execute_prepared), unless
+config.prepared_statements is False (behind a pooler in transaction mode).
+"""
+
+import time
+import weakref
+
+import psycopg2
+import psycopg2.pool
+
+
+## libpq settings added to every connection, config.py credentials take precedence
+KEEPALIVES = dict(keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5)
+APPLICATION_NAME = "rmn_etl"
+
+
+def connection_params(params=None):
+    """
+    Connection keyword arguments: the credentials from config.py, with keepalives, the application
+    name and the statement timeout.
+
+    Parameters:
+        params (dict): Credentials to use instead of the config.py globals, e.g. config.config().
+    """
+    import config
+
+    if params is None:
+        params = dict(database=config.dbname, user=config.username, password=config.password, host=config.host, port=config.port)
+    settings = dict(KEEPALIVES, application_name=APPLICATION_NAME)
+    timeout = getattr(config, 'statement_timeout', None)
+    if timeout:
+        settings['options'] = f"-c statement_timeout={timeout}"
+    settings.update(params)
+    return settings
+
+
+def prepared_statements():
+    """config.prepared_statements, True when it is not set or there is no config.py"""
+    try:
+        import config
+    except ImportError:
+        return True
+    return getattr(config, 'prepared_statements', True)
+
+
+def connect(params=None):
+    """Open a connection with the credentials from config.py (or params)"""
+    return psycopg2.connect(**connection_params(params))
+
+
+class ConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    Thread-safe pool that checks a connection before lending it. A closed connection, or one
+    idle for longer than check_after seconds that fails a SELECT 1 (server restart, dropped
+    network), is discarded and replaced by a new one.
+
+    Parameters:
+        minconn (int): Connections opened up front and kept.
+        maxconn (int): Connections open at most.
+        check_after (float): Idle seconds after which a connection is checked before it is lent.
+    """
+
+    def __init__(self, minconn, maxconn, check_after=30, **params):
+        super().__init__(minconn, maxconn, **params)
+        self.check_after = check_after
+        ## when each connection was last put back, by id
+        self._returned = {}
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        returned = self._returned.pop(id(conn), None)
+        if returned is None or time.monotonic() - returned < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def getconn(self, key=None):
+        """Lend a healthy connection, replacing the broken ones found on the way"""
+        for _ in range(self.maxconn + 1):
+            conn = super().getconn(key)
+            if self._healthy(conn):
+                return conn
+            print("\n....Discarding a broken database connection....\n")
+            super().putconn(conn, key, close=True)
+        raise psycopg2.pool.PoolError("no healthy connection to the database")
+
+    def putconn(self, conn, key=None, close=False):
+        """Take a connection back, rolling back whatever it left open"""
+        self._returned[id(conn)] = time.monotonic()
+        super().putconn(conn, key, close)
+
+
+def create_pool(minconn=1, maxconn=2, params=None, check_after=30):
+    """ConnectionPool of connections with the credentials from config.py (or params)"""
+    return ConnectionPool(minconn, maxconn, check_after, **connection_params(params))
+
+
+## names of the statements prepared on each connection, forgotten with the connection
+_prepared = weakref.WeakKeyDictionary()
+
+
+def execute_prepared(cur, name, query, params):
+    """
+    Run query as the server-side prepared statement name, prepared the first time it runs on
+    the connection, so later runs skip the parse and plan.
+
+    Parameters:
+        cur: psycopg2 cursor
+        name (str): Statement name, unique to query.
+        query (str): SQL with $1, $2 ... placeholders.
+        params (tuple): Values of the placeholders.
+    """
+    names = _prepared.setdefault(cur.connection, set())
+    if name not in names:
+        cur.execute(f"PREPARE {name} AS {query}")
+        names.add(name)
+    cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", tuple(params))
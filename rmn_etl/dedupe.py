@@ -0,0 +1,105 @@
+"""
+Duplicate-survey check for the pa_restoration_monitoring_network tables.
+
+One query over all target tables tells which of them already hold the
+(rmn_id, grant_id, visit) survey. The answer is kept for the rest of the
+run and updated locally as tables are pushed, so repeat checks do not go
+back to the database.
+
+The query depends only on the tables, so it runs as a server-side prepared
+statement: a batch worker checking survey after survey on the same pooled
+connection parses and plans it once.
+"""
+
+import hashlib
+
+from rmn_etl.db import execute_prepared, prepared_statements
+
+SCHEMA = "pa_restoration_monitoring_network"
+
+
+def _validate(columns, values):
+    if len(columns) != 3 or len(values) != 3:
+        raise ValueError("Columns and values must each contain exactly 3 items: [rmn_id, grant_id, visit].")
+
+
+def find_existing_tables(conn, tables, columns, values, schema=SCHEMA, prepare=None):
+    """
+    Return the tables that already hold the survey, in a single round trip.
+
+    Parameters:
+        conn: psycopg2 connection object
+        tables (list): List of table names to query.
+        columns (list): List of column names in the order [rmn_id, grant_id, visit].
+        values (list): List of values to check in the order [rmn_id, grant_id, visit].
+        schema (str): Schema holding the tables.
+        prepare (bool): Run the query as a prepared statement of the connection. Turn off behind a
+                        pooler in transaction mode, where the session is not kept. Defaults to
+                        config.prepared_statements, see rmn_etl.db.
+
+    Returns:
+        set: Names of the tables where the values exist.
+    """
+    _validate(columns, values)
+    tables = list(tables)
+    if not tables:
+        return set()
+
+    rmn_id, grant_id, visit = columns
+
+    # one EXISTS branch per table, all reading the survey key from the same CTE
+    branches = " UNION ALL ".join(
+        f"SELECT '{table}' FROM survey WHERE EXISTS ("
+        f"  SELECT 1 FROM {schema}.{table} t"
+        f"  WHERE t.{rmn_id} = survey.rmn_id AND t.{grant_id} = survey.grant_id AND t.{visit} = survey.visit)"
+        for table in tables
+    )
+    survey = "WITH survey (rmn_id, grant_id, visit) AS (VALUES ({}::text, {}::text, {}::text)) "
+
+    if prepare is None:
+        prepare = prepared_statements()
+    with conn.cursor() as cur:
+        if prepare:
+            query = survey.format('$1', '$2', '$3') + branches
+            name = "rmn_survey_tables_" + hashlib.sha1(query.encode()).hexdigest()[:12]
+            execute_prepared(cur, name, query, values)
+        else:
+            cur.execute(survey.format('%s', '%s', '%s') + branches, tuple(values))
+        return {row[0] for row in cur.fetchall()}
+
+
+class SurveyPresence:
+    """
+    Which target tables already hold a survey, checked once per run.
+
+    Parameters:
+        conn: psycopg2 connection object
+        tables (list): List of table names to query.
+        columns (list): List of column names in the order [rmn_id, grant_id, visit].
+        values (list): List of values to check in the order [rmn_id, grant_id, visit].
+        prepare (bool): Run the check as a prepared statement, see find_existing_tables.
+    """
+
+    def __init__(self, conn, tables, columns, values, schema=SCHEMA, prepare=None):
+        _validate(columns, values)
+        self.tables = list(tables)
+        self.columns = columns
+        self.values = values
+        self.existing = find_existing_tables(conn, self.tables, columns, values, schema, prepare)
+
+    def tables_to_push(self):
+        """Tables where the survey does not exist yet, in the order they were given."""
+        return [table for table in self.tables if table not in self.existing]
+
+    def mark_pushed(self, table):
+        """Record that the survey has just been loaded into table."""
+        self.existing.add(table)
+
+    def report(self):
+        """Print the tables that already hold the survey, without querying the database."""
+        rmn_id, grant_id, visit = self.columns
+        for table in self.tables:
+            if table in self.existing:
+                print(f"\n....The table {table} already has a survey in it with the same {grant_id}, {rmn_id} and {visit}. Skipping....\n")
+
+
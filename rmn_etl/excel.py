@@ -0,0 +1,519 @@
+"""
+Read the excel spreadsheet from RMS and covert each sheet into a dataframe.
+Then remap the columns names and check for invalid records.
+Finally, hands each table to a sink, by default the database.
+
+    from rmn_etl.excel import load_excel_survey
+    load_excel_survey(path, 'MS01', '502418', '1-year', conn=conn)
+"""
+
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+
+import pandas as pd
+
+from rmn_etl.cleaning import normalise_cells, to_db_nulls
+from rmn_etl.db import connect
+from rmn_etl.ids import fix_point_ids
+from rmn_etl.ledger import ImportLedger, frame_hash, shared_table_sheets, sheets_to_reprocess
+from rmn_etl.loader import DatabaseSink
+from rmn_etl.mapping import load_mapping
+from rmn_etl.metrics import NO_METRICS, RunMetrics
+from rmn_etl.pipeline import in_order, prefetch
+from rmn_etl.trace import NO_TRACE
+from rmn_etl.workbook import (FEATURE_STATUS_SHEETS, QUADRAT_SHEETS, STREAMABLE_SHEETS, iter_sheet_chunks, read_sheet,
+                              read_workbook, sheet_sizes)
+
+
+## function to remap sheets:
+
+def remap_sheet(s, df, mapping, rmn_id, grant_id, visit, trace=NO_TRACE):
+    """
+    Rename the columns of a prepared sheet to the database names and keep only the mapped ones.
+
+    The sampling and drain point ids are fixed afterwards by rmn_etl.ids.fix_point_ids.
+
+    Returns:
+        tuple: (database table name, remapped DataFrame)
+    """
+    print("\n\n 3 WITHIN THE REMAP AND EXPORT FUNCTION. S: ", s)
+
+    # rename dictionary and database columns of this sheet, compiled from the map
+    sheet_map = mapping[s]
+    rename_mapping = sheet_map.rename
+
+    print("Rename_mapping: ", rename_mapping)
+
+    ## Add missing fields to the dataframe (updates over the versions)
+    if s == 'Photos':
+        df['dams_link'] = df.get('dams_link', pd.NA)
+
+    if s == 'Area-level assessment':
+        df['other_damage_notes'] = df.get('other_damage_notes', pd.NA)
+
+    # renema colums in the daframe using remap dataframe
+    try:
+        df.rename(columns=rename_mapping, inplace=True)
+    except Exception as e:
+        print("Issue when renaming columns: ", e)
+
+    # fix data times types in any dataframe
+
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+
+    # keep only the columns from the remap dataframe
+    try:
+        trace.snapshot(f'{s}_before_remap', df)
+        df = df[sheet_map.columns]
+    except Exception as e:
+        print("Issue when keeping the columns after remaping: ", e)
+
+    ## add code project ID to every single table
+    df['rmn_id'] = rmn_id
+    df['grant_id'] = grant_id
+    df['visit'] = visit
+
+    # Replace all Nan or Nat on any table
+    df = to_db_nulls(df)  ## replaces any white spaces, NaN or NaT with Null (for PostgreSQL)
+
+    print("\n\n 4 CLEAN : ", s)
+
+    ## remove empty rows
+    exclude_columns = ['rmn_id', 'visit', 'grant_id']
+    columns_to_check = [col for col in df.columns if col not in exclude_columns]
+    df = df[~df[columns_to_check].isnull().all(axis=1)]
+
+    trace.snapshot(f'{s}_after_remap', df)
+
+    return sheet_map.table, df
+
+
+## functions to shape each kind of sheet before the remap:
+
+def prepare_desk_study(df):
+    # Assuming 'NA' is a string in the Excel file, check for empty cells and Nans. Replace empty cells with None for database NULL while keeping 'NA' intact
+    df = normalise_cells(df)
+    df = df.T
+    df = df.dropna(axis=0, how='all') # delete all rows with nulls
+    df = df.dropna(axis=1, how='all') # delete all columns with nulls
+    return df
+
+
+def prepare_feature_status(s, df, trace=NO_TRACE):
+    trace.snapshot(f'{s}_read', df)
+    # Assuming 'NA' is a string in the Excel file, check for empty cells and Nans. Replace empty cells with None for database NULL while keeping 'NA' intact
+    df = normalise_cells(df)
+    df = df.dropna(axis=0, how='all') # delete all rows with nulls
+    df = df.dropna(axis=1, how='all') # delete all columns with nulls
+    df = df.reset_index()
+    df = df.drop([0])  # delete first row from dataframe as it contains the datatypes
+    trace.snapshot(f'{s}_normalised', df)
+    return df
+
+
+def prepare_quadrat_sheet(s, df, trace=NO_TRACE):
+    # Assuming 'NA' is a string in the Excel file, check for empty cells and Nans. Replace empty cells with None for database NULL while keeping 'NA' intact
+    df = normalise_cells(df)
+    df = df.dropna(axis=0, how='all') # delete all rows with nulls
+    df = df.dropna(axis=1, how='all') # delete all columns with nulls
+    df = df.reset_index()
+    df = df.drop([0])  # delete second row from dataframe as it contains the datatypes
+
+    trace.snapshot(f'{s}_normalised', df)
+    return df
+
+
+def prepare_area_level_assessment(s, df, trace=NO_TRACE):
+    # Assuming 'NA' is a string in the Excel file, check for empty cells and Nans. Replace empty cells with None for database NULL while keeping 'NA' intact
+    df = normalise_cells(df)
+    df = df.dropna(axis=0, how='all') # delete all rows with nulls
+    df = df.dropna(axis=1, how='all') # delete all columns with nulls
+
+    # Extract headers (rows B2:B6 as headers)
+    headers_main = df.loc[1:5, 1].astype(str).tolist()  # B2:B6
+
+    # Extract first row of data (C2:C6)
+    first_row_main = df.loc[1:5, 2].tolist()  # C2:C6
+
+    # Create the initial DataFrame
+    df_main = pd.DataFrame([first_row_main], columns=headers_main)
+
+    trace.snapshot(f'{s}_main', df_main)
+
+    # Extract additional headers (B10:B31)
+    headers_extra = df.loc[9:30, 1].astype(str).tolist()  # B10:B31
+
+    # Extract first row of data for extra headers (C10:C31)
+    first_row_extra = df.loc[9:30, 2].tolist()  # C10:C31
+
+    # Extract additional headers with _notes suffix (B10:B31 again)
+    headers_extra_notes = [h + "_notes" for h in headers_extra]
+
+    # Extract first row for _notes headers (D10:D31)
+    first_row_notes = df.loc[9:30, 3].tolist()  # D10:D31
+
+    # Combine into a single DataFrame
+    df_extra = pd.DataFrame([first_row_extra + first_row_notes],
+                            columns=headers_extra + headers_extra_notes)
+
+    trace.snapshot(f'{s}_extra', df_extra)
+
+    # Concatenate both parts horizontally
+    df = pd.concat([df_main, df_extra], axis=1)
+
+    trace.snapshot(f'{s}_normalised', df)
+    return df
+
+
+def prepare_sheet(s, df, trace=NO_TRACE):
+    """
+    Shape a sheet as read from the workbook into one row per record, ready for the remap.
+
+    Returns:
+        DataFrame, or None if the sheet is not one the reader knows about.
+    """
+    if s == 'Desk study':
+        return prepare_desk_study(df)
+    if s in FEATURE_STATUS_SHEETS:
+        return prepare_feature_status(s, df, trace)
+    if s in QUADRAT_SHEETS:
+        return prepare_quadrat_sheet(s, df, trace)
+    if s == 'Area-level assessment':
+        return prepare_area_level_assessment(s, df, trace)
+    return None
+
+
+def process_sheet(s, df, mapping, rmn_id, grant_id, visit, trace=NO_TRACE, metrics=NO_METRICS, fingerprint=False, skip_hash=None):
+    """
+    Prepare, remap and fix the point ids of one sheet as read from the workbook.
+
+    Parameters:
+        fingerprint (bool): Hash the prepared frame, for the import ledger.
+        skip_hash (str): Frame hash of the sheet as last loaded. The sheet is skipped before
+                         the remap when its prepared frame still has it.
+
+    Returns:
+        tuple: (table, DataFrame, frame hash or None). table and DataFrame are None when the
+               sheet is skipped or is not one the reader knows about.
+    """
+    with metrics.stage(s, 'normalise') as stage:
+        df = prepare_sheet(s, df, trace)
+        stage.frame(df)
+    if df is None:
+        return None, None, None
+
+    digest = None
+    if fingerprint:
+        with metrics.stage(s, 'fingerprint'):
+            digest = frame_hash(df)
+        if digest == skip_hash:
+            print(f"\n....{s} unchanged since its last import. Skipping....\n")
+            return None, None, digest
+
+    # get columns names from map file
+    with metrics.stage(s, 'remap') as stage:
+        table, df = remap_sheet(s, df, mapping, rmn_id, grant_id, visit, trace)
+        stage.frame(df)
+    with metrics.stage(s, 'ids') as stage:
+        df = fix_point_ids(df)
+        stage.frame(df)
+
+    return table, df, digest
+
+
+def stream_sheet(s, path, mapping, rmn_id, grant_id, visit, sink, chunk_rows, trace=NO_TRACE, metrics=NO_METRICS):
+    """
+    Load a long quadrat sheet chunk by chunk, so memory stays flat however many rows it has.
+
+    Each chunk is normalised, remapped and gets its point ids fixed like a whole sheet, then goes
+    to the sink before the next one is read. The columns kept are the mapped ones rather than the
+    non-empty ones, which would need the whole sheet. Snapshots are taken of the first chunk only.
+    A DatabaseSink commits the sheet once, after its last chunk (DatabaseSink.transaction), so a
+    chunk failing half-way leaves none of the sheet behind for the duplicate survey check to find.
+
+    Returns:
+        tuple: (table, rows loaded, rows read). Stops reading once the sink takes nothing
+               from a chunk (table skipped or failed).
+    """
+    table = mapping[s].table
+    loaded_rows = read_rows = 0
+    chunks = iter_sheet_chunks(path, s, chunk_rows, columns=mapping[s].rename)
+    held = sink.transaction() if isinstance(sink, DatabaseSink) else nullcontext()
+    try:
+        with held:
+            while True:
+                with metrics.stage(s, 'read') as stage:
+                    df = next(chunks, None)
+                    stage.frame(df)
+                if df is None:
+                    break
+
+                with metrics.stage(s, 'normalise') as stage:
+                    df = normalise_cells(df)
+                    trace.snapshot(f'{s}_normalised', df)
+                    stage.frame(df)
+                with metrics.stage(s, 'remap') as stage:
+                    table, df = remap_sheet(s, df, mapping, rmn_id, grant_id, visit, trace)
+                    stage.frame(df)
+                with metrics.stage(s, 'ids') as stage:
+                    df = fix_point_ids(df)
+                    stage.frame(df)
+                trace = NO_TRACE
+
+                with metrics.stage(s, 'push') as stage:
+                    loaded = sink(table, df)
+                    stage.frame(df)
+                loaded = len(df) if loaded is None else loaded
+                loaded_rows += loaded
+                read_rows += len(df)
+                if loaded == 0 and len(df):
+                    if isinstance(sink, DatabaseSink):
+                        loaded_rows = 0  # the earlier chunks are rolled back with it
+                    break
+    finally:
+        chunks.close()
+
+    return table, loaded_rows, read_rows
+
+
+## workbook opened once by each worker process, its shared strings are the slow part to read
+_worker_xls = None
+
+
+def _init_sheet_worker(path):
+    global _worker_xls
+    pd.options.mode.chained_assignment = None  # spawned workers don't inherit it
+    _worker_xls = pd.ExcelFile(path, engine="openpyxl")
+
+
+def _sheet_worker(s, mapping, rmn_id, grant_id, visit, fingerprint, skip_hash, timed):
+    """
+    Read and process one sheet in a worker process.
+
+    Returns:
+        tuple: (process_sheet result, stage records, printed output), the output is
+               printed by the parent so the log keeps the order of the sheets.
+    """
+    metrics = RunMetrics(s, enabled=timed, track_memory=False)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        with metrics.stage(s, 'read') as stage:
+            df = read_sheet(_worker_xls, s)
+            stage.frame(df)
+        result = process_sheet(s, df, mapping, rmn_id, grant_id, visit, metrics=metrics,
+                               fingerprint=fingerprint, skip_hash=skip_hash)
+    return result, metrics.stages, output.getvalue()
+
+
+def load_excel_survey(path, rmn_id, grant_id, visit, conn=None, mapping=None, sink=None, load_method="copy", trace=NO_TRACE,
+                      atomic=False, replace=False, dry_run=False, metrics=NO_METRICS, ledger=False,
+                      workers=0, chunk_rows=None, validate=False, overlap=False):
+    """
+    Read an RMN Excel survey and send every mapped sheet to the sink.
+
+    Parameters:
+        path (str): The survey .xlsx file.
+        rmn_id (str), grant_id (str), visit (str): The survey the data belongs to.
+        conn: psycopg2 connection. Opened from config.py (and closed afterwards) when not given.
+        mapping (MappingIndex): Compiled mapping, see rmn_etl.mapping.load_mapping. Loaded when not given.
+        sink (callable): sink(table, df) receiving each remapped table. Defaults to a DatabaseSink
+                         pushing the tables that do not hold the survey yet.
+        load_method (str): 'copy', 'insert' or 'merge', used by the default sink.
+        trace (Tracer): Debug snapshots of the intermediate frames, off by default.
+        atomic, replace, dry_run (bool): Transaction mode of the default sink, see DatabaseSink.
+                                         A sink passed in is finished by the caller.
+        metrics (RunMetrics): Time, size and memory of every stage, off by default.
+        ledger (bool): Skip the file when the import ledger shows it unchanged since its last
+                       import, process only its changed sheets when it changed, and record the import.
+                       Sheets whose prepared frame is the one last loaded are skipped before the
+                       remap, so with replace only the changed tables are reloaded.
+        workers (int): Read, prepare and remap the sheets in this many worker processes while
+                       this one pushes them, in map order. 0 processes them one after another here.
+        chunk_rows (int): Stream the long sheets (STREAMABLE_SHEETS) in chunks of this many rows,
+                          each pushed before the next is read. They are read whole when None.
+                          Streamed sheets are not fingerprinted by the ledger and always reloaded.
+        validate (bool): Check the mapping, then every table, against the database catalog before
+                         pushing, see DatabaseSink. A sink passed in validates if it was made to.
+        overlap (bool): Read and prepare the next sheet in a background thread while the current one
+                        is pushed, see rmn_etl.pipeline. One prepared sheet waits for the push at most.
+
+    Returns:
+        dict: {table: rows loaded}
+    """
+    if mapping is None:
+        mapping = load_mapping()
+
+    ## CREATE LIST OF SHEETS OF INTEREST
+    sheets_of_interest = mapping.sheets_of_interest
+    tables = mapping.tables ## get the list for checker
+
+    if conn is None and isinstance(sink, DatabaseSink):
+        conn = sink.conn  # the survey transaction of a shared sink
+    own_conn = sink is None and conn is None
+    if ledger and conn is None and not own_conn:
+        raise ValueError("The import ledger needs a database connection, pass conn")
+    if own_conn:
+        conn = connect()
+
+    own_sink = sink is None
+    # ledger rows go in the survey transaction when there is one
+    in_transaction = (atomic or replace or dry_run) if own_sink else getattr(sink, 'atomic', False)
+    try:
+        start = time.perf_counter()
+        skip_hashes = {}
+        if ledger:
+            import_ledger = ImportLedger(conn, [rmn_id, grant_id, visit], 'excel')
+            with metrics.stage('*', 'ledger'):
+                check = import_ledger.check(path, mapping.version, commit=not in_transaction)
+            import_ledger.report(check)
+            if check.unchanged:
+                if own_sink and in_transaction:
+                    conn.commit()  # the mtime refresh of check(), no survey transaction was started
+                return {}
+            if check.changed_parts is not None:
+                sheets_of_interest = sheets_to_reprocess(mapping, check.changed_parts)
+            ## sheets sharing a table are reloaded together, whatever their frame hash
+            shared = shared_table_sheets(mapping, sheets_of_interest)
+            skip_hashes = {s: check.frames.get(s) for s in sheets_of_interest if s not in shared}
+
+        if own_sink:
+            with metrics.stage('*', 'dedupe'):
+                sink = DatabaseSink(conn, tables, [rmn_id, grant_id, visit], method=load_method,
+                                    atomic=atomic, replace=replace, dry_run=dry_run, validate=validate)
+        if isinstance(sink, DatabaseSink):
+            ## mapping against the database catalog, before anything is read
+            with metrics.stage('*', 'validate'):
+                sheets_of_interest = sink.preflight(mapping, sheets_of_interest)
+
+        streamed = [s for s in sheets_of_interest if chunk_rows and s in STREAMABLE_SHEETS]
+        whole = [s for s in sheets_of_interest if s not in streamed]
+
+        pool = None
+        if (workers or overlap) and trace.enabled:
+            print("Debug snapshots are taken in this process, the sheets are processed one after another")
+            overlap = False
+        elif workers:
+            ## every sheet is read and prepared in a worker while this process pushes the finished ones,
+            ## largest first so the run is not left waiting on a big sheet started last
+            sizes = sheet_sizes(path)
+            present = sorted((s for s in whole if s in sizes), key=sizes.get, reverse=True)
+            if present:  # otherwise nothing to hand out, the missing sheets are reported below
+                pool = ProcessPoolExecutor(max_workers=max(1, min(workers, len(present))),
+                                           initializer=_init_sheet_worker, initargs=(path,))
+                futures = {s: pool.submit(_sheet_worker, s, mapping, rmn_id, grant_id, visit,
+                                          ledger, skip_hashes.get(s), metrics.enabled)
+                           for s in present}
+
+        xls = None
+        if pool is None and overlap:
+            ## the workbook is opened once, each sheet is read ahead of the push in prepare()
+            xls = pd.ExcelFile(path, engine="openpyxl")
+        elif pool is None:
+            ## read every sheet of interest from the workbook in one pass
+            with metrics.stage('*', 'read') as stage:
+                workbook = read_workbook(path, whole)
+                stage.rows = sum(len(df) for df in workbook.values())
+
+        def prepare(s):
+            if pool is not None:
+                if s not in futures:
+                    raise ValueError(s)  # sheet not present in this workbook
+                result, stages, output = futures[s].result()
+                print(output, end='')
+                metrics.stages.extend(stages)
+                return result
+            if xls is not None:
+                with metrics.stage(s, 'read') as stage:
+                    df = read_sheet(xls, s)  # ValueError when the sheet is not in this workbook
+                    stage.frame(df)
+                return process_sheet(s, df, mapping, rmn_id, grant_id, visit, trace, metrics,
+                                     fingerprint=ledger, skip_hash=skip_hashes.get(s))
+            if s not in workbook:
+                raise ValueError(s)  # sheet not present in this workbook
+            return process_sheet(s, workbook[s], mapping, rmn_id, grant_id, visit, trace, metrics,
+                                 fingerprint=ledger, skip_hash=skip_hashes.get(s))
+
+        ## whole sheets, prepared in map order, ahead of the push when overlapping
+        prepared = prefetch(whole, prepare) if overlap else in_order(whole, prepare)
+
+        rows = {}
+        failed = []
+
+        ## loop over each sheet from each excel survey, in map order whatever finishes first
+        try:
+            for s in sheets_of_interest:
+                print("\n\n\\ 1 INDIVIDUAL SHEEETS FROM EXCEL ", s)
+                try:
+                    print("\n 2 ....Preparing table: ", s, "\n")
+                    if s in streamed:
+                        table, loaded, read = stream_sheet(s, path, mapping, rmn_id, grant_id, visit, sink, chunk_rows,
+                                                           trace, metrics)
+                        rows[table] = loaded
+                        if ledger and loaded == read:
+                            check.loaded_without_hash(s)
+                        elif ledger:
+                            check.not_loaded(s)
+                        continue
+
+                    _, result, error = next(prepared)
+                    if error is not None:
+                        raise error
+                    table, df, digest = result
+                    if digest is not None:
+                        check.hash_changed(s, digest)
+                    if df is None:
+                        continue
+
+                    with metrics.stage(s, 'push') as stage:
+                        loaded = sink(table, df)
+                        stage.frame(df)
+                    rows[table] = len(df) if loaded is None else loaded
+                    if ledger and rows[table] == len(df):
+                        check.loaded(s)
+                    elif ledger:
+                        check.not_loaded(s)
+
+                except ValueError:
+                    failed.append(s)
+                    print(f'{s}: Layer not found')
+                except KeyError as k:
+                    failed.append(s)
+                    print(f'{s}: Key Error {k}')
+                except TypeError:
+                    failed.append(s)
+                    print(f'{s}: Data Type Error')
+                except FileNotFoundError:
+                    failed.append(s)
+                    print(f'{path}: File not found')
+                except Exception as e:
+                    failed.append(s)
+                    print(f'Unexpected error occurred. Could be related with the sheets names in excel being different or not present: {e}')
+        finally:
+            prepared.close()
+            if xls is not None:
+                xls.close()
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        if isinstance(sink, DatabaseSink):
+            sink.report()
+        if ledger:
+            import_ledger.finish(check, mapping.version, rows, time.perf_counter() - start,
+                                 failed_parts=failed, failed_tables=getattr(sink, 'failed', []),
+                                 commit=not in_transaction)
+        if own_sink:
+            sink.finish()
+
+        return rows
+
+    except BaseException:
+        if own_sink and sink is not None:
+            sink.abort()
+        raise
+
+    finally:
+        if own_conn:
+            conn.close()
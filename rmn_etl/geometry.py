@@ -0,0 +1,37 @@
+"""
+Vectorized geometry stage of the spatial reader, built on shapely 2 array functions.
+
+Every function takes an array-like of shapely geometries (a GeoSeries or its
+.array works) and returns a numpy array, so a whole layer is processed in one
+call instead of one Python call per feature.
+"""
+
+import numpy as np
+import shapely
+
+
+SRID = 27700  # British National Grid
+
+
+def force_2d(geoms):
+    """Drop the Z (and M) coordinates, e.g. of the GNSS sampling and drain points"""
+    return shapely.force_2d(np.asarray(geoms, dtype=object))
+
+
+def to_multipolygons(geoms):
+    """Promote Polygons to single-part MultiPolygons, every other geometry is kept"""
+    geoms = np.asarray(geoms, dtype=object).copy()
+    is_polygon = shapely.get_type_id(geoms) == shapely.GeometryType.POLYGON
+    if is_polygon.any():
+        polygons = geoms[is_polygon]
+        geoms[is_polygon] = shapely.multipolygons(polygons, indices=np.arange(len(polygons)))
+    return geoms
+
+
+def to_ewkb_hex(geoms, srid=SRID):
+    """
+    Encode geometries as hex EWKB carrying the SRID, which PostGIS parses on
+    both COPY and INSERT. Missing geometries become None (NULL).
+    """
+    geoms = shapely.set_srid(np.asarray(geoms, dtype=object), srid)
+    return shapely.to_wkb(geoms, hex=True, include_srid=True)
@@ -0,0 +1,49 @@
+"""
+Pruned reader for the RMN monitoring geopackage.
+
+The layers are listed once up front, then each mapped layer is read through
+pyogrio with Arrow output, asking GDAL for the mapped fields only and
+applying the row filters as SQL, instead of gpd.read_file loading every
+field of every row and the reader filtering them in pandas afterwards.
+"""
+
+import pyogrio
+
+try:
+    import pyarrow  # noqa: F401
+    USE_ARROW = True
+except ImportError:  # Arrow is only faster, the frames are the same without it
+    USE_ARROW = False
+
+
+## row filters run by GDAL (SQLite for a geopackage) while reading each layer
+LAYER_FILTERS = {
+    'sampling_point': "\"source\" = 'field'",
+}
+
+## fields the reader needs whether the map keeps them or not
+ALWAYS_READ = ['date']
+
+
+def layer_names(path):
+    """Names of the layers in the geopackage, listed once before any of them is read"""
+    return [name for name, _ in pyogrio.list_layers(path)]
+
+
+def read_layer(path, layer, columns=None):
+    """
+    Read one layer with its geometry, the given fields only and the rows kept by LAYER_FILTERS.
+
+    Parameters:
+        path (str): The survey monitoring.gpkg file.
+        layer (str): Layer name.
+        columns (iterable): Fields to read, usually the template names of the mapping ('geometry'
+                            is always read). Names the layer does not have are ignored. All when None.
+
+    Returns:
+        GeoDataFrame
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys([c for c in columns if c != 'geometry'] + ALWAYS_READ))
+    return pyogrio.read_dataframe(path, layer=layer, columns=columns, where=LAYER_FILTERS.get(layer),
+                                  use_arrow=USE_ARROW)
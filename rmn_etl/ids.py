@@ -0,0 +1,57 @@
+"""
+Normalisation of the sampling point identifiers shared by both readers.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def modify_sampling_point(value):
+    """Zero-pad a single digit suffix, e.g. MS01_Q_1 -> MS01_Q_01"""
+    parts = value.rsplit("_", 1) # get the last part of the string, split from right
+    if len(parts) == 2 and parts[-1].isdigit(): # makes sure valid split and numeric last part
+        if len(parts[-1]) == 1: # check if the last bit is 1,2,3,4,5,6,7,8,9
+            parts[-1] = f"0{parts[-1]}" # add the 0
+    return "_".join(parts) # join back the modified value
+
+
+def normalise_sampling_points(col):
+    """
+    modify_sampling_point over a whole column.
+
+    A survey repeats the same sampling point on many rows (one Vegetation row per
+    species per quadrat), so the column is factorized and each distinct id is
+    normalised once. Missing values and anything that is not a string are left as they are.
+
+    Parameters:
+        col (Series): Sampling point ids.
+
+    Returns:
+        Series: Normalised ids, same index as col.
+    """
+    codes, uniques = pd.factorize(col, use_na_sentinel=True)
+    normalised = np.array(
+        [modify_sampling_point(u) if isinstance(u, str) else u for u in uniques], dtype=object
+    )
+
+    values = col.to_numpy(dtype=object, copy=True)
+    present = codes != -1
+    values[present] = normalised[codes[present]]
+    return pd.Series(values, index=col.index, name=col.name)
+
+
+def drain_points(sampling_points):
+    """Drain point id of each sampling point, e.g. MS01_D_01 -> MS01_D_01_drain"""
+    return sampling_points + "_drain"
+
+
+def fix_point_ids(df):
+    """Normalise the sampling point ids of a remapped frame and derive its drain point ids from them"""
+    if "sampling_point" in df.columns:
+        # Apply the transformation
+        df["sampling_point"] = normalise_sampling_points(df["sampling_point"])
+
+    if "drain_point" in df.columns:
+        # update the drain columns by adding underscore
+        df["drain_point"] = drain_points(df["sampling_point"])
+    return df
@@ -0,0 +1,72 @@
+"""
+Drop the non-essential indexes of the target tables around a bulk load.
+
+Indexes that back a constraint (the natural keys) and the survey indexes
+(*_survey_idx, migrations/0005) are essential: the merge load method and the
+duplicate survey check need them, so they are always kept. Every other index (spatial and analyst indexes) is dropped
+before the load and rebuilt once afterwards from its saved definition,
+which is cheaper than maintaining it row by row during a large load.
+
+    with indexes_dropped(conn, mapping.tables):
+        ...load...
+"""
+
+import time
+from contextlib import contextmanager
+
+from rmn_etl.dedupe import SCHEMA
+
+
+## suffix of the (rmn_id, grant_id, visit) indexes of the duplicate survey check
+SURVEY_INDEX_SUFFIX = "_survey_idx"
+
+def droppable_indexes(conn, tables, schema=SCHEMA):
+    """
+    Indexes of tables that do not back a constraint and are not survey indexes.
+
+    Returns:
+        list: (index name, CREATE INDEX statement)
+    """
+    query = """
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = %s AND i.tablename = ANY(%s) AND right(i.indexname, %s) <> %s
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conindid = (quote_ident(i.schemaname) || '.' || quote_ident(i.indexname))::regclass)
+        ORDER BY i.tablename, i.indexname
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, (schema, list(tables), len(SURVEY_INDEX_SUFFIX), SURVEY_INDEX_SUFFIX))
+        return cur.fetchall()
+
+
+def drop_indexes(conn, indexes, schema=SCHEMA):
+    with conn.cursor() as cur:
+        for name, _ in indexes:
+            cur.execute(f'DROP INDEX IF EXISTS {schema}."{name}"')
+    conn.commit()
+
+
+def create_indexes(conn, indexes):
+    with conn.cursor() as cur:
+        for _, definition in indexes:
+            cur.execute(definition)
+    conn.commit()
+
+
+@contextmanager
+def indexes_dropped(conn, tables, schema=SCHEMA):
+    """
+    Drop the non-essential indexes of tables, and rebuild them when the block ends, even on error.
+    conn is only used for the index statements, the load itself should use other connections.
+    """
+    indexes = droppable_indexes(conn, tables, schema)
+    drop_indexes(conn, indexes, schema)
+    print(f"{len(indexes)} non-essential indexes dropped for the load")
+    try:
+        yield indexes
+    finally:
+        start = time.perf_counter()
+        create_indexes(conn, indexes)
+        print(f"{len(indexes)} indexes rebuilt in {time.perf_counter() - start:.1f} s")
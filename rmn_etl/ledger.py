@@ -0,0 +1,273 @@
+"""
+Import ledger: which version of each survey file is already in the database.
+
+Every successful import writes a row to import_ledger (migrations/0002) with
+the file's size, modification time, content hash, the mapping version, a hash
+per sheet or layer and the rows loaded per table. Before a file is parsed
+again, it is compared with the last row of its survey:
+
+    unchanged   same size and mtime (or, failing that, same content hash) and
+                same mapping: nothing to do, answered with one stat and one query
+    changed     the parts whose hash differs are listed, so only those sheets
+                or layers are reprocessed
+    new         never imported (or the mapping changed): process everything
+
+Part hashes come straight from the containers, without parsing them:
+    .xlsx   CRC-32 of each worksheet's XML in the zip directory, combined with
+            the CRC of the shared strings table (a change there flags every sheet)
+    .gpkg   SHA-256 of the rows of each layer table, read through sqlite3
+
+A part can change without its data changing (a shared string added elsewhere,
+a layer rewritten in another order), so the readers also hash every prepared
+frame before the remap. A sheet whose frame is the one last loaded is skipped;
+the others are reloaded, with --replace, inside the survey transaction. Sheets
+loading into the same table are reloaded together, so a replace never drops
+the rows of a skipped sheet.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import zipfile
+from collections import Counter
+
+import pandas as pd
+
+from rmn_etl.dedupe import SCHEMA
+from rmn_etl.mapping import file_sha256
+from rmn_etl.workbook import sheet_members
+
+
+def xlsx_part_hashes(path):
+    """{sheet name: hash} of a workbook, from the CRCs stored in its zip directory"""
+    with zipfile.ZipFile(path) as z:
+        crcs = {info.filename: info.CRC for info in z.infolist()}
+    shared = crcs.get('xl/sharedStrings.xml', 0)
+    return {sheet: f"{crcs.get(member, 0):08x}{shared:08x}" for sheet, member in sheet_members(path).items()}
+
+
+def gpkg_part_hashes(path):
+    """{layer name: hash} of a geopackage, from the rows of each layer table"""
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        layers = [row[0] for row in con.execute("SELECT table_name FROM gpkg_contents")]
+        hashes = {}
+        for layer in layers:
+            digest = hashlib.sha256()
+            for row in con.execute(f'SELECT * FROM "{layer}" ORDER BY rowid'):
+                digest.update(repr(row).encode())
+            hashes[layer] = digest.hexdigest()
+        return hashes
+    finally:
+        con.close()
+
+
+def part_hashes(path):
+    """Hash of every sheet or layer of a survey file"""
+    if path.lower().endswith('.gpkg'):
+        return gpkg_part_hashes(path)
+    return xlsx_part_hashes(path)
+
+
+def frame_hash(df):
+    """Stable hash of a prepared frame: its column names and the values of its rows, in order"""
+    digest = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def sheets_to_reprocess(mapping, changed_parts):
+    """Mapped sheets among changed_parts, plus the sheets loading into the same tables, in map order"""
+    tables = {mapping[s].table for s in changed_parts if s in mapping.sheets}
+    return [s for s in mapping.sheets_of_interest if s in changed_parts or mapping[s].table in tables]
+
+
+def shared_table_sheets(mapping, sheets):
+    """Sheets loading into the same table as another of sheets, never skipped on their own"""
+    tables = Counter(mapping[s].table for s in sheets)
+    return {s for s in sheets if tables[mapping[s].table] > 1}
+
+
+class FileFingerprint:
+    """Size and mtime of a file, with its content and part hashes computed on first use"""
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self._sha256 = None
+        self._parts = None
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = file_sha256(self.path)
+        return self._sha256
+
+    @property
+    def parts(self):
+        if self._parts is None:
+            self._parts = part_hashes(self.path)
+        return self._parts
+
+
+class LedgerCheck:
+    """
+    Outcome of ImportLedger.check.
+
+    Attributes:
+        status (str): 'unchanged', 'changed' or 'new'.
+        changed_parts (list): Sheets or layers to reprocess when changed, None otherwise.
+        fingerprint (FileFingerprint): Of the file checked, reused by record().
+        frames (dict): {sheet or layer: frame hash} of the data in the database, updated
+                       by loaded() and recorded with the import.
+        unloaded (list): Sheets or layers processed but not (fully) loaded, see not_loaded().
+    """
+
+    def __init__(self, status, fingerprint, changed_parts=None, frames=None):
+        self.status = status
+        self.fingerprint = fingerprint
+        self.changed_parts = changed_parts
+        self.frames = dict(frames or {})
+        self.unloaded = []
+        self._pending = {}
+
+    @property
+    def unchanged(self):
+        return self.status == 'unchanged'
+
+    def frame_changed(self, part, df):
+        """Hash the prepared frame of part. True unless it is the frame last loaded from it."""
+        return self.hash_changed(part, frame_hash(df))
+
+    def hash_changed(self, part, digest):
+        """As frame_changed, for a frame hashed elsewhere (in a worker process)"""
+        self._pending[part] = digest
+        return self.frames.get(part) != digest
+
+    def loaded(self, part):
+        """The frame of part hashed by frame_changed() is now in the database"""
+        if part in self._pending:
+            self.frames[part] = self._pending.pop(part)
+
+    def not_loaded(self, part):
+        """
+        The sink did not take all the rows of part: its table failed, or already held the survey
+        and was skipped. The import is then not recorded, so the part is processed again next time.
+        """
+        self._pending.pop(part, None)
+        if part not in self.unloaded:
+            self.unloaded.append(part)
+
+    def loaded_without_hash(self, part):
+        """part was reloaded without hashing its frame (streamed), so it is never skipped next time"""
+        self.frames.pop(part, None)
+
+
+class ImportLedger:
+    """
+    Parameters:
+        conn: psycopg2 connection object
+        values (list): [rmn_id, grant_id, visit] of the survey.
+        kind (str): 'excel' or 'spatial'.
+    """
+
+    def __init__(self, conn, values, kind, schema=SCHEMA):
+        self.conn = conn
+        self.values = list(values)
+        self.kind = kind
+        self.table = f"{schema}.import_ledger"
+
+    def last(self):
+        """Last ledger row of the survey, as a dict, or None"""
+        query = (
+            f"SELECT file_size, file_mtime, file_sha256, mapping_version, part_hashes, frame_hashes, id FROM {self.table} "
+            f"WHERE rmn_id = %s AND grant_id = %s AND visit = %s AND kind = %s ORDER BY id DESC LIMIT 1"
+        )
+        with self.conn.cursor() as cur:
+            cur.execute(query, (*self.values, self.kind))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        size, mtime, sha256, mapping_version, parts, frames, ledger_id = row
+        if isinstance(parts, str):
+            parts, frames = json.loads(parts), json.loads(frames)
+        return dict(size=size, mtime=mtime, sha256=sha256, mapping_version=mapping_version, parts=parts,
+                    frames=frames, id=ledger_id)
+
+    def check(self, path, mapping_version, commit=True):
+        """
+        Compare the file at path with the last import of the survey.
+
+        commit=False leaves the lookup (and the mtime refresh of a touched but identical
+        file) in the survey transaction instead of committing it straight away. The caller
+        then commits it, also when the file is unchanged and nothing else is loaded.
+        """
+        fingerprint = FileFingerprint(path)
+        last = self.last()
+        if last is None or last['mapping_version'] != mapping_version:
+            result = LedgerCheck('new', fingerprint)
+        elif last['size'] == fingerprint.size and last['mtime'] == fingerprint.mtime:
+            result = LedgerCheck('unchanged', fingerprint)
+        elif last['size'] == fingerprint.size and last['sha256'] == fingerprint.sha256:
+            # same content, touched or copied: remember the new mtime for the fast path
+            with self.conn.cursor() as cur:
+                cur.execute(f"UPDATE {self.table} SET file_mtime = %s WHERE id = %s", (fingerprint.mtime, last['id']))
+            result = LedgerCheck('unchanged', fingerprint)
+        else:
+            old, new = last['parts'], fingerprint.parts
+            result = LedgerCheck('changed', fingerprint, [part for part in new if old.get(part) != new[part]],
+                                 frames=last['frames'])
+
+        if commit:
+            self.conn.commit()
+        return result
+
+    def record(self, check, mapping_version, rows, seconds):
+        """Add the import to the ledger, in the current transaction (the caller commits)"""
+        fp = check.fingerprint
+        query = (
+            f"INSERT INTO {self.table} (rmn_id, grant_id, visit, kind, file_path, file_size, file_mtime, file_sha256, "
+            f"mapping_version, part_hashes, frame_hashes, row_counts, duration_s) "
+            f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        )
+        with self.conn.cursor() as cur:
+            cur.execute(query, (*self.values, self.kind, os.path.abspath(fp.path), fp.size, fp.mtime, fp.sha256,
+                                mapping_version, json.dumps(fp.parts), json.dumps(check.frames), json.dumps(rows), seconds))
+
+    def finish(self, check, mapping_version, rows, seconds, failed_parts=(), failed_tables=(), commit=True):
+        """
+        Record the import unless something failed or was not loaded (LedgerCheck.not_loaded), so a
+        partial import is retried next time. Recording it would mark the file as imported and the
+        parts left out would never be reloaded, not even with --replace.
+
+        Parameters:
+            failed_parts (list): Sheets or layers that raised. Names that are not parts of
+                                 this file (the sheets of the other reader) are ignored.
+            failed_tables (list): Tables the sink could not load.
+            commit (bool): Commit the ledger row now, or leave it to the survey transaction.
+
+        Returns:
+            bool: True if the import was recorded.
+        """
+        failed = [s for s in failed_parts if s in check.fingerprint.parts] + list(failed_tables)
+        if failed:
+            print(f"\n....Not recorded in the import ledger, these did not load: {', '.join(failed)}....\n")
+            return False
+        if check.unloaded:
+            print(f"\n....Not recorded in the import ledger, these were not reloaded: {', '.join(check.unloaded)}. "
+                  "Run again with --replace or --load-method merge to load them....\n")
+            return False
+        self.record(check, mapping_version, rows, seconds)
+        if commit:
+            self.conn.commit()
+        return True
+
+    def report(self, check):
+        if check.status == 'unchanged':
+            print(f"\n....{check.fingerprint.path} is unchanged since its last import. Skipping....\n")
+        elif check.status == 'changed':
+            print(f"\n....{check.fingerprint.path} changed since its last import, in: {', '.join(check.changed_parts) or 'nothing'}....\n"
+                  "....Changed tables already holding the survey are only reloaded with --replace or --load-method merge....\n")
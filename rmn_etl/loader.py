@@ -0,0 +1,466 @@
+"""
+Push remapped DataFrames into PostgreSQL.
+
+Three load methods are available:
+    copy    stream the frame as CSV through COPY ... FROM STDIN (default)
+    insert  multi-VALUES INSERT through psycopg2.extras.execute_values
+    merge   COPY into a staging table, then INSERT ... ON CONFLICT on the
+            natural key of the table: new rows are inserted, changed rows
+            updated and identical rows left alone. Rows of the survey that
+            are no longer in it (a corrected key) are deleted
+
+Geometry columns are expected as WKT/EWKT or hex EWKB text, which
+PostGIS parses on input for both methods.
+
+By default every table is committed on its own, and the pushes made in a
+DatabaseSink.transaction() block (the chunks of a streamed sheet) together. An atomic DatabaseSink
+instead loads the whole survey in one transaction, each table inside a
+savepoint, and commits once at the end only if every table loaded; it can
+also replace a survey already in the database, or roll everything back
+(dry run).
+"""
+
+import io
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+import psycopg2.extras as extras
+
+from rmn_etl.dedupe import SCHEMA, SurveyPresence
+from rmn_etl.validation import ValidationReport, check_mapping, coerce_frame, load_catalog
+
+
+LOAD_METHODS = ["copy", "insert", "merge"]
+KEY_COLUMNS = ["rmn_id", "grant_id", "visit"]
+ENTRY = "entry"
+
+## natural key of every target table, backed by the UNIQUE NULLS NOT DISTINCT constraints in
+## db_queries.sql (migrations/0004). Each ends with entry, see number_entries
+NATURAL_KEYS = {table: key + [ENTRY] for table, key in {
+    "desk_study": KEY_COLUMNS,
+    "area_level_assessment": KEY_COLUMNS,
+    "monitoring_area": KEY_COLUMNS,
+    "quadrat_information": KEY_COLUMNS + ["sampling_point"],
+    "vegetation": KEY_COLUMNS + ["sampling_point", "species"],
+    "photos": KEY_COLUMNS + ["title"],
+    "feature_status_drains": KEY_COLUMNS + ["sampling_point"],
+    "feature_status_gullies": KEY_COLUMNS + ["sampling_point"],
+    "feature_status_hags": KEY_COLUMNS + ["sampling_point"],
+    "feature_status_bare_peat": KEY_COLUMNS + ["sampling_point"],
+    "feature_status_forest_to_bog": KEY_COLUMNS + ["sampling_point"],
+    "sampling_points": KEY_COLUMNS + ["sampling_point_id"],
+    "drain_points": KEY_COLUMNS + ["drain_point_id"],
+    "fpp_points": KEY_COLUMNS + ["easting", "northing", "bearing"],
+}.items()}
+
+
+def number_entries(df, keys, previous=None):
+    """
+    Number the rows repeating the rest of the natural key (the same species recorded twice in one
+    quadrat) 1, 2, ... in the entry column, so every row has a key of its own and a resubmission
+    merges the n-th row of a key onto the n-th row stored. NULLs count as equal, like the constraint.
+
+    Parameters:
+        df (DataFrame): Frame about to be pushed.
+        keys (list): Natural key of the table, ending with entry.
+        previous (DataFrame): Key columns of the rows already pushed to the table in this run
+                              (earlier chunks or sheets), numbered before those of df.
+
+    Returns:
+        tuple: (df with the entry column, key columns of every row pushed so far)
+    """
+    cols = [k for k in keys if k != ENTRY]
+    current = df[cols]
+    every = current if previous is None else pd.concat([previous, current], ignore_index=True)
+    entries = every.groupby(cols, dropna=False, sort=False).cumcount().to_numpy() + 1
+    out = df.copy(deep=False)
+    out[ENTRY] = entries[len(every) - len(df):]
+    return out, every
+
+
+def _csv_ready(df):
+    """
+    Prepare a frame for CSV output so COPY reads the same values an INSERT would.
+
+    Object columns holding only numbers become numeric columns, and float columns
+    holding only whole numbers are written without the trailing '.0' so they load
+    into INT columns.
+    """
+    out = df.infer_objects()
+    for i in range(out.shape[1]):
+        col = out.iloc[:, i]
+        if col.dtype.kind == 'f':
+            values = col.dropna()
+            if ((values % 1) == 0).all() and (values.abs() < 2**53).all():
+                out.isetitem(i, col.astype('Int64'))
+    return out
+
+
+def copy_dataframe(cur, df, table):
+    """
+    Load a frame with COPY ... FROM STDIN (FORMAT csv) from an in-memory buffer.
+
+    Parameters:
+        cur: psycopg2 cursor
+        df (DataFrame): Frame whose column names match the table columns.
+        table (str): Schema qualified table name.
+    """
+    buffer = io.StringIO()
+    _csv_ready(df).to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+
+    cols = ','.join(list(df.columns))
+    query = f"COPY {table} ({cols}) FROM STDIN WITH (FORMAT csv)"
+    print(query)
+    cur.copy_expert(query, buffer)
+
+
+def insert_dataframe(cur, df, table, page_size=1000):
+    """
+    Load a frame with a multi-VALUES INSERT.
+
+    https://www.geeksforgeeks.org/how-to-insert-a-pandas-dataframe-to-an-existing-postgresql-table/
+
+    Parameters:
+        cur: psycopg2 cursor
+        df (DataFrame): Frame whose column names match the table columns.
+        table (str): Schema qualified table name.
+        page_size (int): Rows sent per INSERT statement.
+    """
+    ## typed columns hold numpy scalars and pd.NA, which psycopg2 cannot adapt
+    tuples = [tuple(x) for x in df.astype(object).where(df.notna(), None).to_numpy()]
+
+    cols = ','.join(list(df.columns))
+
+    # SQL query to execute
+    query = f"INSERT INTO %s(%s) VALUES %%s" % (table, cols)
+    print(query)
+    extras.execute_values(cur, query, tuples, page_size=page_size)
+
+
+def merge_dataframe(cur, df, table, keys=None, survey=None, kept=None):
+    """
+    Upsert a frame through a staging table.
+
+    The frame is copied into a temporary table shaped like the target (temporary
+    tables are not WAL-logged and are private to the session), then merged on the
+    natural key. Only rows whose values differ from the stored ones are updated.
+    When the frame repeats a key, its last row wins.
+
+    With survey, the stored rows of that survey whose key is neither in the frame nor
+    in kept are deleted afterwards, so a corrected key (a species typo, a renamed
+    sampling point) replaces the old row instead of adding to it.
+
+    Parameters:
+        cur: psycopg2 cursor
+        df (DataFrame): Frame whose column names match the table columns.
+        table (str): Schema qualified table name.
+        keys (list): Natural key columns, looked up in NATURAL_KEYS when not given.
+        survey (list): [rmn_id, grant_id, visit] of the frame. Nothing is deleted when not given.
+        kept (DataFrame): Keys of the rows merged into the table earlier in the same load (other
+                          chunks or sheets of the table), which are not deleted.
+
+    Returns:
+        int: Rows inserted or updated.
+    """
+    if keys is None:
+        keys = NATURAL_KEYS.get(table.split('.')[-1])
+        if keys is None:
+            raise ValueError(f"No natural key known for {table}, add it to NATURAL_KEYS")
+    missing = [k for k in keys if k not in df.columns]
+    if missing:
+        raise ValueError(f"Cannot merge into {table}: the key columns {missing} are not in the data")
+
+    staging = "staging_" + table.split('.')[-1]
+    cur.execute(f"DROP TABLE IF EXISTS pg_temp.{staging}")
+    cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    copy_dataframe(cur, df, staging)
+
+    cols = list(df.columns)
+    values = [c for c in cols if c not in keys]
+    key_list = ','.join(keys)
+
+    # DISTINCT ON keeps one row per key, ON CONFLICT cannot touch the same row twice
+    query = (
+        f"INSERT INTO {table} AS t ({','.join(cols)}) "
+        f"SELECT DISTINCT ON ({key_list}) {','.join(cols)} FROM {staging} ORDER BY {key_list}, ctid DESC "
+    )
+    if values:
+        query += (
+            f"ON CONFLICT ({key_list}) DO UPDATE SET "
+            + ', '.join(f"{c} = EXCLUDED.{c}" for c in values)
+            + f" WHERE ({', '.join(f't.{c}' for c in values)})"
+            f" IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in values)})"
+        )
+    else:
+        query += f"ON CONFLICT ({key_list}) DO NOTHING"
+    print(query)
+    cur.execute(query)
+    merged = cur.rowcount
+
+    if survey is not None:
+        stale = (f"SELECT {key_list} FROM {table} WHERE {_survey_condition()} "
+                 f"EXCEPT SELECT {key_list} FROM {staging}")
+        if kept is not None and len(kept):
+            merged_before = "merged_" + table.split('.')[-1]
+            cur.execute(f"DROP TABLE IF EXISTS pg_temp.{merged_before}")
+            cur.execute(f"CREATE TEMP TABLE {merged_before} ON COMMIT DROP AS SELECT {key_list} FROM {table} WITH NO DATA")
+            copy_dataframe(cur, kept[keys], merged_before)
+            stale += f" EXCEPT SELECT {key_list} FROM {merged_before}"
+        # EXCEPT matches NULLs like the key constraint does, and leaves only the few stale keys to join
+        query = (
+            f"DELETE FROM {table} AS t USING ({stale}) AS s WHERE {_survey_condition('t.')} "
+            f"AND ({', '.join(f't.{k}' for k in keys)}) IS NOT DISTINCT FROM ({', '.join(f's.{k}' for k in keys)})"
+        )
+        print(query)
+        cur.execute(query, tuple(survey) * 2)
+        print(f"{cur.rowcount} rows no longer in the survey deleted")
+        if kept is not None and len(kept):
+            cur.execute(f"DROP TABLE pg_temp.{merged_before}")
+
+    cur.execute(f"DROP TABLE pg_temp.{staging}")
+    return merged
+
+
+def _survey_condition(alias=''):
+    """WHERE condition selecting one survey, with its [rmn_id, grant_id, visit] as parameters"""
+    return ' AND '.join(f"{alias}{c} = %s" for c in KEY_COLUMNS)
+
+
+def delete_survey(cur, table, values):
+    """Delete the rows of the survey [rmn_id, grant_id, visit] from table"""
+    query = f"DELETE FROM {table} WHERE {_survey_condition()}"
+    print(query)
+    cur.execute(query, tuple(values))
+    return cur.rowcount
+
+
+def push_dataframe(conn, df, table, method="copy", commit=True, replace_values=None, survey=None, kept=None):
+    """
+    Push a frame to the database and commit, rolling back on error.
+
+    With commit=False the load runs inside a savepoint of the current transaction
+    instead: a failure only undoes this table and nothing is committed.
+
+    Parameters:
+        conn: psycopg2 connection object
+        df (DataFrame): Frame whose column names match the table columns.
+        table (str): Schema qualified table name.
+        method (str): 'copy', 'insert' or 'merge'.
+        commit (bool): Commit after the load, or leave it to the caller.
+        replace_values (list): [rmn_id, grant_id, visit] of rows deleted before the load.
+        survey (list), kept (DataFrame): Merge only, delete the rows of the survey that are no longer
+                                         in it, see merge_dataframe.
+
+    Returns:
+        int: 1 if the load failed, None otherwise.
+    """
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method '{method}', expected one of {LOAD_METHODS}")
+
+    cursor = conn.cursor()
+    try:
+        if not commit:
+            cursor.execute("SAVEPOINT push_table")
+        if replace_values is not None:
+            print(f"{delete_survey(cursor, table, replace_values)} rows deleted")
+        if method == "copy":
+            copy_dataframe(cursor, df, table)
+        elif method == "merge":
+            print(f"{merge_dataframe(cursor, df, table, survey=survey, kept=kept)} rows inserted or updated")
+        else:
+            insert_dataframe(cursor, df, table)
+        if commit:
+            conn.commit()
+        else:
+            cursor.execute("RELEASE SAVEPOINT push_table")
+    except (Exception, psycopg2.DatabaseError) as error:
+        print("Error: %s" % error)
+        if commit:
+            conn.rollback()
+        else:
+            cursor.execute("ROLLBACK TO SAVEPOINT push_table")
+        cursor.close()
+        return 1
+    print("\n....The dataframe is inserted....\n")
+    cursor.close()
+
+
+class DatabaseSink:
+    """
+    Default sink of the readers: push each remapped table to the database,
+    skipping the tables that already hold the survey.
+
+    An atomic sink keeps the whole survey in the current transaction, which
+    finish() commits only if every table loaded. It can be shared by the Excel
+    and spatial readers to load a complete survey at once.
+
+    Parameters:
+        conn: psycopg2 connection object
+        tables (list): Target tables of the survey, checked once for an existing survey.
+        values (list): [rmn_id, grant_id, visit] of the survey.
+        method (str): 'copy', 'insert' or 'merge'. Merge pushes every table, whether
+                      it already holds the survey or not, and deletes the rows of the survey
+                      that the new data no longer has.
+        atomic (bool): One transaction for the survey instead of a commit per table.
+        replace (bool): Delete the survey from each table before loading it again. Implies atomic.
+        dry_run (bool): Load everything, then roll back in finish(). Implies atomic.
+        validate (bool): Also check the mapping against the database catalog before any sheet is
+                         read, and print the validation report even when it is clean.
+        coerce (bool): Convert every frame to the types of its table columns before pushing it
+                       (rmn_etl.validation.coerce_frame). Tables with cells that do not fit are
+                       not pushed and the problems are printed together by finish().
+        prepare (bool): Run the duplicate survey check as a prepared statement. Defaults to
+                        config.prepared_statements, turn off behind a pooler in transaction mode.
+    """
+
+    def __init__(self, conn, tables, values, method="copy", atomic=False, replace=False, dry_run=False, validate=False,
+                 coerce=True, prepare=None):
+        self.conn = conn
+        self.method = method
+        self.values = values
+        self.replace = replace
+        self.dry_run = dry_run
+        self.atomic = atomic or replace or dry_run
+        self.failed = []
+        self.cleared = set()
+        ## tables pushed inside a transaction() block, None outside of one
+        self.held = None
+        ## key columns of the rows pushed to each table, so later chunks and sheets number on from them
+        self.entries = {}
+        self.validate = validate
+        self.coerce = coerce
+        self.validation = ValidationReport() if validate or coerce else None
+        ## one query, cached for the process. Also tells which tables have the entry column of 0004
+        self.catalog = load_catalog(conn)
+        ## one query, kept for the whole run
+        self.presence = SurveyPresence(conn, tables, KEY_COLUMNS, values, prepare=prepare)
+        if replace or method == "merge":
+            self.tables_to_push = list(self.presence.tables)
+        else:
+            self.presence.report()
+            self.tables_to_push = self.presence.tables_to_push()
+
+    def preflight(self, mapping, sheets):
+        """
+        Check the tables and mapped columns of sheets against the catalog, before anything is read.
+        The tables with problems are marked as failed.
+
+        Returns:
+            list: The sheets still worth reading. None at all when an atomic survey is already
+                  bound to be rolled back.
+        """
+        if not self.validate:
+            return sheets
+        issues = check_mapping(mapping, sheets, self.catalog, KEY_COLUMNS)
+        self.validation.add(issues)
+        doomed = {i.table for i in issues}
+        self.failed.extend(t for t in doomed if t not in self.failed)
+        if self.atomic and self.failed:
+            return []
+        return [s for s in sheets if mapping[s].table not in doomed]
+
+    def __call__(self, table, df):
+        """Push df into table. Returns the number of rows loaded."""
+        if table not in self.tables_to_push:
+            return 0
+
+        ## only tables migrated by 0004 have the entry column, the others are loaded as they are
+        kept = None
+        if table in NATURAL_KEYS and ENTRY in self.catalog.get(table, {}):
+            previous = self.entries.get(table)
+            df, self.entries[table] = number_entries(df, NATURAL_KEYS[table], previous)
+            if previous is not None and self.method == "merge":
+                kept, _ = number_entries(previous, NATURAL_KEYS[table])
+
+        if self.coerce:
+            df, issues = coerce_frame(table, df, self.catalog)
+            if issues:
+                self.validation.add(issues)
+                if table not in self.failed:
+                    self.failed.append(table)
+                return 0
+            if self.atomic and self.failed:
+                return 0  # rolled back anyway, keep checking the rest for the report
+
+        # the survey is deleted once per table, later sheets of the same table add to it
+        replace_values = None
+        if self.replace and table not in self.cleared:
+            replace_values = self.values
+            self.cleared.add(table)
+
+        print(f"\n....Pushing table {table}....\n")
+        if self.held is not None:
+            self.held.add(table)
+        if push_dataframe(self.conn, df, f"{SCHEMA}.{table}", method=self.method,
+                          commit=not (self.atomic or self.held is not None), replace_values=replace_values,
+                          survey=self.values, kept=kept) == 1:
+            self.failed.append(table)
+            return 0
+        self.presence.mark_pushed(table)
+        return len(df)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Commit the pushes of the block together when it ends, or roll them all back if one of
+        them failed or the block raised, e.g. for the chunks of a streamed sheet. The tables of
+        a rolled back block are marked as failed. Nothing changes for an atomic sink, which
+        already holds the whole survey.
+        """
+        if self.atomic or self.held is not None:
+            yield
+            return
+        failed = len(self.failed)
+        existing, entries = set(self.presence.existing), dict(self.entries)
+        self.held = set()
+        try:
+            yield
+            ok = len(self.failed) == failed
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            held, self.held = self.held, None
+            if ok:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+                self.presence.existing, self.entries = existing, entries
+                self.failed.extend(t for t in sorted(held) if t not in self.failed)
+                if held:
+                    print(f"\n....Rolled back, nothing of {', '.join(sorted(held))} is left loaded....\n")
+
+    def report(self):
+        """Print the tables that already hold the survey"""
+        if not (self.replace or self.method == "merge"):
+            self.presence.report()
+
+    def finish(self):
+        """
+        End the survey transaction of an atomic sink: commit if every table loaded,
+        roll back on a dry run or after any failure.
+
+        Returns:
+            bool: True if the survey was committed.
+        """
+        if self.validation is not None and (self.validate or not self.validation.ok):
+            self.validation.print()
+        if not self.atomic:
+            return not self.failed
+        if self.failed or self.dry_run:
+            self.conn.rollback()
+            if self.failed:
+                print(f"\n....Survey rolled back, these tables failed: {', '.join(self.failed)}....\n")
+            else:
+                print("\n....Dry run, survey rolled back....\n")
+            return False
+        self.conn.commit()
+        print("\n....Survey committed....\n")
+        return True
+
+    def abort(self):
+        """Roll back the survey transaction after an unexpected error"""
+        if self.atomic:
+            self.conn.rollback()
@@ -0,0 +1,146 @@
+"""
+The mapping workbook (map/RMN data for database.xlsx) tells, for every
+Excel sheet or geopackage layer, which fields go to which database table.
+
+The workbook is compiled once into a MappingIndex (per sheet: rename dict,
+ordered database columns and target table) and cached in a JSON file next
+to it. The cache is keyed by the workbook's modification time and content
+hash, so later runs skip openpyxl entirely until the workbook changes.
+"""
+
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+import pandas as pd
+
+
+MAP_PATH = os.path.join('map', 'RMN data for database.xlsx')
+CACHE_FORMAT = 1
+
+
+class SheetMapping(NamedTuple):
+    """How one sheet or layer is remapped"""
+    rename: dict  # field name in the template -> column name in the database
+    columns: list  # database columns kept, in map order
+    table: str  # target table in pa_restoration_monitoring_network
+
+
+class MappingIndex:
+    """
+    Compiled mapping: {sheet or layer: SheetMapping}, in map order.
+
+    Parameters:
+        sheets (dict): {sheet: SheetMapping}
+        version (str): sha256 of the mapping workbook it was compiled from.
+    """
+
+    def __init__(self, sheets, version=None):
+        self.sheets = sheets
+        self.version = version
+
+    def __getitem__(self, sheet):
+        return self.sheets[sheet]
+
+    @property
+    def sheets_of_interest(self):
+        return list(self.sheets)
+
+    @property
+    def tables(self):
+        """Target tables, without duplicates, in map order"""
+        return list(dict.fromkeys(m.table for m in self.sheets.values()))
+
+    @classmethod
+    def from_frame(cls, map_df, version=None):
+        """Compile a mapping frame already filtered by 'Upload to DB'"""
+        sheets = {}
+        for s in map_df['Tab or geopackage layer'].unique():
+            remap_df = map_df[map_df['Tab or geopackage layer'] == s]
+            rename = dict(zip(remap_df['Field name'], remap_df['Field name for DB']))
+            sheets[s] = SheetMapping(rename, list(rename.values()), remap_df['Database layer'].iloc[0])
+        return cls(sheets, version)
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'sheets': [
+                {'sheet': s, 'table': m.table, 'fields': list(m.rename.items())}
+                for s, m in self.sheets.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sheets = {}
+        for entry in data['sheets']:
+            rename = dict((source, target) for source, target in entry['fields'])
+            sheets[entry['sheet']] = SheetMapping(rename, list(rename.values()), entry['table'])
+        return cls(sheets, data['version'])
+
+
+def read_map(path=MAP_PATH):
+    """
+    Read the mapping workbook and keep only the fields flagged for upload.
+
+    Returns:
+        DataFrame: Rows of the map where 'Upload to DB' is 'Yes'.
+    """
+    map_df = pd.read_excel(path)
+    return map_df[map_df['Upload to DB'] == 'Yes']  # keep only columns where Upload to DB is YES
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_path(path):
+    return path + '.cache.json'
+
+
+def load_mapping(path=MAP_PATH, use_cache=True):
+    """
+    Return the compiled mapping of the workbook at path, from the cache when it is up to date.
+
+    The modification time is checked first; the workbook is only hashed when it differs
+    from the cached one, and only parsed when the hash differs too.
+
+    Returns:
+        MappingIndex
+    """
+    cache_path = _cache_path(path)
+    mtime = os.path.getmtime(path)
+
+    cached = None
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+        if cached is not None and cached.get('format') != CACHE_FORMAT:
+            cached = None
+
+    if cached is not None and cached['mtime'] == mtime:
+        return MappingIndex.from_dict(cached['mapping'])
+
+    version = file_sha256(path)
+    if cached is not None and cached['mapping']['version'] == version:
+        mapping = MappingIndex.from_dict(cached['mapping'])
+    else:
+        mapping = MappingIndex.from_frame(read_map(path), version)
+
+    if use_cache:
+        try:
+            with open(cache_path, 'w') as f:
+                json.dump({'format': CACHE_FORMAT, 'mtime': mtime, 'mapping': mapping.to_dict()}, f, indent=1)
+        except (OSError, TypeError) as e:
+            print(f"Could not write the mapping cache {cache_path}: {e}")
+
+    return mapping
@@ -0,0 +1,178 @@
+"""
+Small helpers to measure the cost of a run.
+
+RunMetrics records, for every stage of every sheet or layer (read, normalise,
+remap, ids, geometry, dedupe, push), its wall time, the rows and bytes of the
+frame it produced and the peak of Python memory allocated during the stage.
+The records are written as a JSON run report:
+
+    metrics = RunMetrics("MS01_502418_1-year_excel")
+    with metrics.stage("Vegetation", "normalise") as stage:
+        df = normalise_cells(df)
+        stage.frame(df)
+    metrics.write("report.json")
+
+A disabled RunMetrics (the default of the readers) records nothing.
+"""
+
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, or None if it can't be measured.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().peak_wset / 1024 ** 2
+
+
+class Stage:
+    """One timed stage, filled in by the code it wraps"""
+
+    def __init__(self, sheet, name):
+        self.sheet = sheet
+        self.name = name
+        self.rows = None
+        self.bytes = None
+        self._df = None
+
+    def frame(self, df):
+        """Record the frame the stage produced, measured once the stage time is taken"""
+        self._df = df
+
+    def _measure(self):
+        if self._df is not None:
+            self.rows = len(self._df)
+            self.bytes = int(self._df.memory_usage(index=False, deep=True).sum())
+            self._df = None
+
+
+class _NoStage:
+    def frame(self, df):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+class RunMetrics:
+    """
+    Parameters:
+        label (str): Name of the run in the report.
+        enabled (bool): Record anything at all.
+        track_memory (bool): Peak memory per stage through tracemalloc, which slows the run down.
+    """
+
+    def __init__(self, label="run", enabled=True, track_memory=True):
+        self.label = label
+        self.enabled = enabled
+        self.track_memory = enabled and track_memory
+        self.stages = []
+        self.start = time.perf_counter()
+        self._own_tracing = False
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracing = True
+
+    @contextmanager
+    def stage(self, sheet, name):
+        """Time the block as stage name of sheet. Stages must not be nested."""
+        if not self.enabled:
+            yield _NO_STAGE
+            return
+
+        record = Stage(sheet, name)
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        failed = True
+        start = time.perf_counter()
+        try:
+            yield record
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            if self.track_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+            record._measure()
+            entry = {
+                'sheet': sheet,
+                'stage': name,
+                'seconds': round(seconds, 4),
+                'rows': record.rows,
+                'bytes': record.bytes,
+            }
+            if self.track_memory:
+                entry['peak_mb'] = round(peak / 1024 ** 2, 2)
+            if failed:
+                entry['failed'] = True
+            self.stages.append(entry)
+
+    def report(self):
+        """The run report as a dict"""
+        return {
+            'label': self.label,
+            'seconds': round(time.perf_counter() - self.start, 3),
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': self.stages,
+        }
+
+    def close(self):
+        if self._own_tracing:
+            tracemalloc.stop()
+            self._own_tracing = False
+
+    def write(self, path):
+        """Write the report as JSON"""
+        write_report(path, [self.report()])
+
+    def print_slowest(self, n=5):
+        """Print the n slowest stages of the run"""
+        for entry in sorted(self.stages, key=lambda e: e['seconds'], reverse=True)[:n]:
+            print(f"{entry['seconds']:8.3f} s  {entry['stage']:10s} {entry['sheet']}")
+
+
+def write_report(path, runs):
+    """Write the reports of one or more runs as JSON"""
+    with open(path, 'w') as f:
+        json.dump({'runs': runs}, f, indent=1)
+    print(f"Run report written to {path}")
+
+
+## shared disabled recorder, the default of every reader function
+NO_METRICS = RunMetrics(enabled=False)
+
+
+@contextmanager
+def _profiling(path):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path} (open with python -m pstats or snakeviz)")
+
+
+def profiled(path=None):
+    """cProfile the block into path, or do nothing when path is None"""
+    return _profiling(path) if path else nullcontext()
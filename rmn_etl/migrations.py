@@ -0,0 +1,80 @@
+"""
+Versioned schema migrations for pa_restoration_monitoring_network.
+
+Migrations are the numbered .sql files in migrations/, applied in name order.
+Each one runs in its own transaction and is recorded in schema_migrations,
+so running this again only applies the new ones:
+
+    python -m rmn_etl.migrations
+"""
+
+import argparse
+import glob
+import os
+
+from rmn_etl.db import connect
+from rmn_etl.dedupe import SCHEMA
+
+
+MIGRATIONS_DIR = 'migrations'
+
+
+def applied_versions(cur, schema=SCHEMA):
+    """Versions already recorded in schema_migrations, created on first use"""
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {schema}.schema_migrations ("
+        f"  version VARCHAR(255) PRIMARY KEY,"
+        f"  applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    )
+    cur.execute(f"SELECT version FROM {schema}.schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR, schema=SCHEMA):
+    """
+    Apply the migrations of directory that are not recorded yet.
+
+    Returns:
+        list: Versions applied by this call.
+    """
+    with conn.cursor() as cur:
+        done = applied_versions(cur, schema)
+    conn.commit()
+
+    applied = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.sql'))):
+        version = os.path.splitext(os.path.basename(path))[0]
+        if version in done:
+            continue
+
+        print(f"Applying {version}")
+        with open(path) as f:
+            migration = f.read()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(migration)
+                cur.execute(f"INSERT INTO {schema}.schema_migrations (version) VALUES (%s)", (version,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the pending schema migrations.")
+    parser.add_argument('--dir', type=str, default=MIGRATIONS_DIR, help="Folder holding the numbered .sql migrations")
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        applied = apply_migrations(conn, args.dir)
+    finally:
+        conn.close()
+    print(f"{len(applied)} migrations applied" if applied else "Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Overlap the preparation of the next sheet or layer with the push of the current one.
+
+With overlap=True the readers hand the read, normalise and remap of every
+sheet or layer to prefetch(), which runs them in one background thread while
+the reader pushes the tables already prepared:
+
+    for s, (table, df), error in prefetch(sheets, prepare):
+        ...
+        sink(table, df)
+
+The prepared frames wait in a bounded queue, so a slow database holds the
+preparation back instead of letting frames pile up in memory. psycopg2
+releases the GIL while it waits on the server, so the preparation really
+runs during the push, and a run takes about max(prepare, push) instead of
+their sum when the database is far away (VPN).
+"""
+
+import queue
+import threading
+
+
+_DONE = object()
+
+
+def in_order(items, prepare):
+    """prefetch() without the thread: each item is prepared when the consumer asks for it"""
+    for item in items:
+        try:
+            yield item, prepare(item), None
+        except Exception as e:
+            yield item, None, e
+
+
+def prefetch(items, prepare, depth=1):
+    """
+    Yield (item, prepare(item), None) for each item in order, prepare running in a background
+    thread ahead of the consumer. An item whose prepare raised is yielded as (item, None, error)
+    and the next items are still prepared.
+
+    Parameters:
+        items (iterable): Sheets or layers, in the order they are consumed.
+        prepare (callable): prepare(item), safe to run in another thread.
+        depth (int): Prepared items waiting for the consumer at most. One more can be in preparation.
+    """
+    results = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        ## waits while the queue is full, gives up once the consumer has gone
+        while not stop.is_set():
+            try:
+                results.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        for item in items:
+            try:
+                entry = (item, prepare(item), None)
+            except BaseException as e:  # the consumer must not wait for a result that never comes
+                entry = (item, None, e)
+            if not put(entry):
+                return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name="rmn-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            entry = results.get()
+            if entry is _DONE:
+                return
+            yield entry
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,283 @@
+"""
+Read the monitoring geopackage from RMS and covert each layer into a dataframe.
+Then remap the columns names and check for invalid records.
+Finally, hands each table to a sink, by default the database.
+
+    from rmn_etl.spatial import load_spatial_survey
+    load_spatial_survey(path, 'MS01', '502418', '1-year', conn=conn)
+"""
+
+import time
+
+import pandas as pd
+
+from rmn_etl.cleaning import to_db_nulls
+from rmn_etl.db import connect
+from rmn_etl.geopackage import layer_names, read_layer
+from rmn_etl.geometry import force_2d, to_ewkb_hex, to_multipolygons
+from rmn_etl.ids import fix_point_ids
+from rmn_etl.ledger import ImportLedger, shared_table_sheets, sheets_to_reprocess
+from rmn_etl.loader import DatabaseSink
+from rmn_etl.mapping import load_mapping
+from rmn_etl.metrics import NO_METRICS
+from rmn_etl.pipeline import in_order, prefetch
+from rmn_etl.trace import NO_TRACE
+
+
+## function to remap layers:
+
+def remap_layer(s, df, mapping, rmn_id, grant_id, visit, trace=NO_TRACE):
+    """
+    Rename the columns of a prepared layer to the database names and keep only the mapped ones.
+
+    The sampling and drain point ids are fixed afterwards by rmn_etl.ids.fix_point_ids.
+
+    Returns:
+        tuple: (database table name, remapped DataFrame)
+    """
+    print("\n\n 3 WITHIN THE REMAP AND EXPORT FUNCTION. S: ", s)
+
+    # rename dictionary and database columns of this sheet, compiled from the map
+    sheet_map = mapping[s]
+    rename_mapping = sheet_map.rename
+
+    print("Rename_mapping: ", rename_mapping)
+
+    # renema colums in the daframe using remap dataframe
+    try:
+        df.rename(columns=rename_mapping, inplace=True)
+    except Exception as e:
+        print("Issue when renaming columns: ", e)
+
+    # fix data times types in any dataframe
+
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+
+    ## keep the highest year
+    if s == 'sampling_point':
+        df['year'] = df['date'].dt.year  # Extract year from the date column
+        if df['year'].nunique() == 1:
+            df.drop('year', axis=1, inplace=True)  # Drop the year column
+        elif df['year'].nunique() > 1:
+            df = df[df['year'] == df['year'].max()]  # Keep only rows with the highest year
+            print("MAX YEAR", df['year'].max())
+            df.drop(columns=['year'], axis=1, inplace=True)  # Drop the year column after filtering
+
+    # keep only the columns from the remap dataframe
+    try:
+        trace.snapshot(f'{s}_before_remap', df)
+        df = df[sheet_map.columns]
+    except Exception as e:
+        print("Issue when keeping the columns after remaping: ", e)
+
+    ## add code project ID to every single table
+    df['rmn_id'] = rmn_id
+    df['grant_id'] = grant_id
+    df['visit'] = visit
+
+    # Replace all Nan or Nat on any table
+    df = to_db_nulls(df)  ## replaces any white spaces, NaN or NaT with Null (for PostgreSQL)
+
+    print("\n\n 4 CLEAN : ", s)
+
+    trace.snapshot(f'{s}_after_remap', df)
+
+    return sheet_map.table, df
+
+
+def prepare_layer(s, df, trace=NO_TRACE):
+    """
+    Fix the geometries of a layer as read by rmn_etl.geopackage.read_layer (sampling points
+    already filtered to the field ones) and encode them as EWKB in EPSG:27700, ready for the remap.
+    """
+    if s == 'monitoring_area':
+        df = df.dissolve()
+        df['geometry'] = to_multipolygons(df['geometry'].array)
+
+    if s in ('sampling_point', 'drain_points'):
+        df['geometry'] = force_2d(df['geometry'].array)
+
+    df = df.dropna(axis=0, how='all') # delete all rows with nulls
+    df = df.dropna(axis=1, how='all') # delete all columns with nulls
+    df = df.reset_index(drop=True)
+    df = pd.DataFrame(df)  # plain frame from here on, the geometry column becomes text
+    df['geometry'] = to_ewkb_hex(df['geometry'].array) # convert all geometries to EWKB text, otherwise psycopg2 cant deal with it
+
+    trace.snapshot(f'{s}_prepared', df)
+    return df
+
+
+def load_spatial_survey(path, rmn_id, grant_id, visit, conn=None, mapping=None, sink=None, load_method="copy", trace=NO_TRACE,
+                        atomic=False, replace=False, dry_run=False, metrics=NO_METRICS, ledger=False,
+                        validate=False, overlap=False):
+    """
+    Read an RMN monitoring geopackage and send every mapped layer to the sink.
+
+    Parameters:
+        path (str): The survey monitoring.gpkg file.
+        rmn_id (str), grant_id (str), visit (str): The survey the data belongs to.
+        conn: psycopg2 connection. Opened from config.py (and closed afterwards) when not given.
+        mapping (MappingIndex): Compiled mapping, see rmn_etl.mapping.load_mapping. Loaded when not given.
+        sink (callable): sink(table, df) receiving each remapped table. Defaults to a DatabaseSink
+                         pushing the tables that do not hold the survey yet.
+        load_method (str): 'copy', 'insert' or 'merge', used by the default sink.
+        trace (Tracer): Debug snapshots of the intermediate frames, off by default.
+        atomic, replace, dry_run (bool): Transaction mode of the default sink, see DatabaseSink.
+                                         A sink passed in is finished by the caller.
+        metrics (RunMetrics): Time, size and memory of every stage, off by default.
+        ledger (bool): Skip the file when the import ledger shows it unchanged since its last
+                       import, process only its changed layers when it changed, and record the import.
+                       Layers whose prepared frame is the one last loaded are skipped before the
+                       remap, so with replace only the changed tables are reloaded.
+        validate (bool): Check the mapping, then every table, against the database catalog before
+                         pushing, see DatabaseSink. A sink passed in validates if it was made to.
+        overlap (bool): Read and prepare the next layer in a background thread while the current one
+                        is pushed, see rmn_etl.pipeline. One prepared layer waits for the push at most.
+
+    Returns:
+        dict: {table: rows loaded}
+    """
+    if mapping is None:
+        mapping = load_mapping()
+
+    ## CREATE LIST OF LAYERS OF INTEREST
+    sheets_of_interest = mapping.sheets_of_interest
+    tables = mapping.tables ## get the list for checker
+
+    if conn is None and isinstance(sink, DatabaseSink):
+        conn = sink.conn  # the survey transaction of a shared sink
+    own_conn = sink is None and conn is None
+    if ledger and conn is None and not own_conn:
+        raise ValueError("The import ledger needs a database connection, pass conn")
+    if own_conn:
+        conn = connect()
+
+    own_sink = sink is None
+    # ledger rows go in the survey transaction when there is one
+    in_transaction = (atomic or replace or dry_run) if own_sink else getattr(sink, 'atomic', False)
+    try:
+        start = time.perf_counter()
+        if ledger:
+            import_ledger = ImportLedger(conn, [rmn_id, grant_id, visit], 'spatial')
+            with metrics.stage('*', 'ledger'):
+                check = import_ledger.check(path, mapping.version, commit=not in_transaction)
+            import_ledger.report(check)
+            if check.unchanged:
+                if own_sink and in_transaction:
+                    conn.commit()  # the mtime refresh of check(), no survey transaction was started
+                return {}
+            if check.changed_parts is not None:
+                sheets_of_interest = sheets_to_reprocess(mapping, check.changed_parts)
+            ## sheets sharing a table are reloaded together, whatever their frame hash
+            shared = shared_table_sheets(mapping, sheets_of_interest)
+
+        if own_sink:
+            with metrics.stage('*', 'dedupe'):
+                sink = DatabaseSink(conn, tables, [rmn_id, grant_id, visit], method=load_method,
+                                    atomic=atomic, replace=replace, dry_run=dry_run, validate=validate)
+        if isinstance(sink, DatabaseSink):
+            ## mapping against the database catalog, before anything is read
+            with metrics.stage('*', 'validate'):
+                sheets_of_interest = sink.preflight(mapping, sheets_of_interest)
+
+        ## list the layers once, every read below only asks for the mapped fields
+        with metrics.stage('*', 'layers'):
+            layers = layer_names(path)
+
+        def prepare(s):
+            """Read, prepare and remap one layer. Returns (table, df), None when it is unchanged"""
+            print("\n\n\\ 1 INDIVIDUAL SHEEETS FROM EXCEL ", s)
+            print("\n 2 ....Preparing table: ", s, "\n")
+            if s not in layers:
+                raise ValueError(s)  # layer not present in this geopackage
+
+            with metrics.stage(s, 'read') as stage:
+                df = read_layer(path, s, mapping[s].rename)
+                stage.frame(df)
+
+            with metrics.stage(s, 'geometry') as stage:
+                df = prepare_layer(s, df, trace)
+                stage.frame(df)
+
+            if ledger:
+                with metrics.stage(s, 'fingerprint'):
+                    changed = check.frame_changed(s, df)
+                if not changed and s not in shared:
+                    print(f"\n....{s} unchanged since its last import. Skipping....\n")
+                    return None
+
+            # get columns names from map file
+            with metrics.stage(s, 'remap') as stage:
+                table, df = remap_layer(s, df, mapping, rmn_id, grant_id, visit, trace)
+                stage.frame(df)
+            with metrics.stage(s, 'ids') as stage:
+                df = fix_point_ids(df)
+                stage.frame(df)
+            return table, df
+
+        if overlap and trace.enabled:
+            print("Debug snapshots are taken in this process, the layers are processed one after another")
+            overlap = False
+        ## layers prepared in map order, ahead of the push when overlapping
+        prepared = prefetch(sheets_of_interest, prepare) if overlap else in_order(sheets_of_interest, prepare)
+
+        rows = {}
+        failed = []
+
+        ## loop over each layer from each geopackage survey
+        try:
+            for s, result, error in prepared:
+                try:
+                    if error is not None:
+                        raise error
+                    if result is None:
+                        continue
+                    table, df = result
+
+                    with metrics.stage(s, 'push') as stage:
+                        loaded = sink(table, df)
+                        stage.frame(df)
+                    rows[table] = len(df) if loaded is None else loaded
+                    if ledger and rows[table] == len(df):
+                        check.loaded(s)
+                    elif ledger:
+                        check.not_loaded(s)
+
+                except ValueError:
+                    failed.append(s)
+                    print(f'{s}: Layer not found')
+                except KeyError as k:
+                    failed.append(s)
+                    print(f'{s}: Key Error {k}')
+                except TypeError:
+                    failed.append(s)
+                    print(f'{s}: Data Type Error')
+                except FileNotFoundError:
+                    failed.append(s)
+                    print(f'{path}: File not found')
+                except Exception as e:
+                    failed.append(s)
+                    print(f'Unexpected error occurred. Could be related with the sheets names in excel being different or not present: {e}')
+        finally:
+            prepared.close()
+
+        if isinstance(sink, DatabaseSink):
+            sink.report()
+        if ledger:
+            import_ledger.finish(check, mapping.version, rows, time.perf_counter() - start,
+                                 failed_parts=failed, failed_tables=getattr(sink, 'failed', []),
+                                 commit=not in_transaction)
+        if own_sink:
+            sink.finish()
+
+        return rows
+
+    except BaseException:
+        if own_sink and sink is not None:
+            sink.abort()
+        raise
+
+    finally:
+        if own_conn:
+            conn.close()
@@ -0,0 +1,117 @@
+"""
+Debug snapshots of the frames a reader builds, off by default.
+
+When a trace directory is given, every snapshot is written as Parquet into a
+per-run folder by a background thread, so the reader does not wait for it.
+Snapshots are sampled down to max_rows and the run stops writing once
+max_bytes have been written. An index.json in the run folder lists every
+snapshot with its full and written row counts.
+
+    trace = Tracer("traces", label="MS01_502418_1-year_excel")
+    trace.snapshot("Vegetation_before_remap", df)
+    trace.close()
+
+A disabled Tracer (the default) returns from snapshot() straight away.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Tracer:
+    """
+    Parameters:
+        trace_dir (str): Folder receiving one sub-folder per run. None disables tracing.
+        label (str): Name of the run folder, after a timestamp.
+        max_rows (int): Rows kept per snapshot, sampled evenly from larger frames.
+        max_bytes (int): Bytes written per run, later snapshots are skipped.
+    """
+
+    def __init__(self, trace_dir=None, label="run", max_rows=1000, max_bytes=100 * 1024 ** 2):
+        self.enabled = trace_dir is not None
+        if not self.enabled:
+            return
+
+        try:
+            import pyarrow  # noqa: F401  (needed by DataFrame.to_parquet)
+        except ImportError:
+            raise ImportError("Tracing writes Parquet files and needs pyarrow: pip install pyarrow")
+
+        self.run_dir = os.path.join(trace_dir, f"{time.strftime('%Y%m%d-%H%M%S')}_{label}")
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.written_bytes = 0
+        self.entries = []
+        self._writer = ThreadPoolExecutor(max_workers=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def snapshot(self, name, df):
+        """Queue a sampled copy of df to be written as <n>_<name>.parquet"""
+        if not self.enabled:
+            return
+
+        sample = df
+        if len(df) > self.max_rows:
+            step = len(df) / self.max_rows
+            sample = df.iloc[[int(i * step) for i in range(self.max_rows)]]
+        # copy now, the reader keeps changing its frames in place
+        sample = sample.copy()
+
+        entry = {'name': name, 'rows': len(df), 'rows_written': len(sample), 'columns': df.shape[1]}
+        file_name = f"{len(self.entries):03d}_{name}.parquet".replace(os.sep, "_")
+        self.entries.append(entry)
+        self._writer.submit(self._write, sample, os.path.join(self.run_dir, file_name), entry)
+
+    def _write(self, sample, path, entry):
+        if self.written_bytes >= self.max_bytes:
+            entry['skipped'] = 'size cap reached'
+            return
+        try:
+            _parquet_safe(sample).to_parquet(path, index=False)
+        except Exception as e:
+            entry['skipped'] = f'{type(e).__name__}: {e}'
+            return
+        entry['file'] = os.path.basename(path)
+        entry['bytes'] = os.path.getsize(path)
+        self.written_bytes += entry['bytes']
+
+    def close(self):
+        """Wait for the queued snapshots and write index.json"""
+        if not self.enabled:
+            return
+        self._writer.shutdown(wait=True)
+        with open(os.path.join(self.run_dir, 'index.json'), 'w') as f:
+            json.dump(self.entries, f, indent=1)
+        print(f"Trace written to {self.run_dir}")
+
+
+def _parquet_safe(df):
+    """
+    Parquet needs unique string column names and one type per column: the index becomes
+    a column and mixed object columns are stored as text.
+    """
+    df = df.reset_index()
+    names, seen = [], {}
+    for c in df.columns:
+        name = str(c)
+        seen[name] = seen.get(name, -1) + 1
+        names.append(name if seen[name] == 0 else f"{name}.{seen[name]}")
+    df.columns = names
+
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        if col.dtype == object:
+            df.isetitem(i, col.astype("string"))
+    return df
+
+
+## shared disabled tracer, the default of every reader function
+NO_TRACE = Tracer()
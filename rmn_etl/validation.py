@@ -0,0 +1,246 @@
+"""
+Pre-flight checks of the remapped tables against the live database catalog.
+
+The columns of every target table are read once from information_schema.columns
+and cached for the process, then:
+
+    before any sheet is read    every mapped column exists in its table, and every
+                                NOT NULL column without a default is mapped
+    before each push            every value fits its column: numbers in numeric
+                                columns, whole numbers in range in integer ones,
+                                dates in date ones, booleans in boolean ones, text
+                                within the VARCHAR length, no NULL in NOT NULL columns
+
+Like rmn_etl.cleaning, each column is factorized and the checks run once per
+distinct value. The same pass converts each column to the pandas dtype of its
+database type (coerce_frame), which is what the loader then pushes. The
+problems of a survey are collected in one ValidationReport, and a table with
+problems is not pushed.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from rmn_etl.dedupe import SCHEMA
+
+
+class ColumnInfo(NamedTuple):
+    """One column of a table, from information_schema.columns"""
+    data_type: str
+    max_length: int  # VARCHAR(n) / CHAR(n), None otherwise
+    precision: int  # NUMERIC(p, s)
+    scale: int
+    nullable: bool
+    has_default: bool
+
+
+class Issue(NamedTuple):
+    """A problem with one column of one table"""
+    table: str
+    column: str
+    check: str  # 'table', 'column', 'not null', 'type', 'length'
+    message: str
+    rows: int = 0  # rows affected, 0 for the mapping checks
+    examples: tuple = ()  # a few of the offending values
+    at: tuple = ()  # the first rows holding them, counted from 1
+
+
+## catalogs already read, by (database, schema)
+_catalogs = {}
+
+
+def load_catalog(conn, schema=SCHEMA, refresh=False):
+    """
+    Columns of every table of schema, read with one query and cached for the process.
+
+    Returns:
+        dict: {table: {column: ColumnInfo}}
+    """
+    key = (getattr(conn, 'dsn', id(conn)), schema)
+    if refresh or key not in _catalogs:
+        query = """
+            SELECT table_name, column_name, data_type, character_maximum_length,
+                   numeric_precision, numeric_scale, is_nullable = 'YES', column_default IS NOT NULL
+            FROM information_schema.columns
+            WHERE table_schema = %s
+            ORDER BY table_name, ordinal_position
+        """
+        with conn.cursor() as cur:
+            cur.execute(query, (schema,))
+            rows = cur.fetchall()
+        catalog = {}
+        for table, column, *info in rows:
+            catalog.setdefault(table, {})[column] = ColumnInfo(*info)
+        _catalogs[key] = catalog
+    return _catalogs[key]
+
+
+def check_columns(table, columns, catalog):
+    """Issues of a table loaded with these columns: unknown table or columns, NOT NULL columns left out"""
+    if table not in catalog:
+        return [Issue(table, '', 'table', "table not in the database")]
+    target = catalog[table]
+    issues = [Issue(table, c, 'column', "column not in the table") for c in columns if c not in target]
+    issues += [Issue(table, c, 'not null', "NOT NULL column without default is not loaded")
+               for c, info in target.items() if not info.nullable and not info.has_default and c not in columns]
+    return issues
+
+
+def check_mapping(mapping, sheets, catalog, extra_columns=()):
+    """
+    check_columns for the table and mapped columns of every sheet, before anything is read.
+
+    Parameters:
+        extra_columns (list): Columns every reader adds to every table (rmn_id, grant_id, visit).
+    """
+    issues = []
+    for s in sheets:
+        sheet_map = mapping[s]
+        issues += check_columns(sheet_map.table, list(sheet_map.columns) + list(extra_columns), catalog)
+    return issues
+
+
+## what PostgreSQL accepts for a boolean, case aside
+_BOOLEANS = {'t': True, 'true': True, 'y': True, 'yes': True, 'on': True, '1': True,
+             'f': False, 'false': False, 'n': False, 'no': False, 'off': False, '0': False}
+_INT_LIMITS = {'smallint': 2 ** 15, 'integer': 2 ** 31, 'bigint': 2 ** 63}
+
+
+def _convert_uniques(uniques, info):
+    """
+    Convert the distinct values of a column to the pandas dtype of its database type, and flag
+    the values the column would refuse.
+
+    Returns:
+        tuple: (converted, flags, reason). converted is an extension array over uniques with the
+               refused values as NA, or None for the types left as they are (text, geometry).
+               flags is None for types that are not checked.
+    """
+    data_type = info.data_type
+    if data_type in _INT_LIMITS or data_type in ('numeric', 'real', 'double precision'):
+        numbers = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=float)
+        bad = np.isnan(numbers)
+        if data_type in _INT_LIMITS:
+            limit = _INT_LIMITS[data_type]
+            with np.errstate(invalid='ignore'):
+                bad |= (numbers % 1 != 0) | (numbers < -limit) | (numbers >= limit)
+            numbers[bad] = np.nan
+            return pd.array(numbers, dtype='Int64'), bad, f"not a whole number that fits {data_type}"
+        reason = "not a number"
+        if data_type == 'numeric' and info.precision is not None:
+            limit = 10.0 ** (info.precision - (info.scale or 0))
+            with np.errstate(invalid='ignore'):
+                bad |= np.abs(numbers) >= limit
+            reason = f"not a number below {limit:g} (NUMERIC({info.precision},{info.scale or 0}))"
+        numbers[bad] = np.nan
+        return pd.array(numbers, dtype='Float64'), bad, reason
+
+    if data_type == 'date' or data_type.startswith('timestamp'):
+        ## a bare number would be read as nanoseconds since 1970
+        numbers = np.array([isinstance(u, (int, float, np.number)) for u in uniques], dtype=bool)
+        values = pd.Series(uniques, dtype=object).where(~numbers)
+        dates = pd.to_datetime(values, errors='coerce', format='mixed')
+        if data_type == 'date':
+            dates = dates.dt.normalize()
+        return dates.array, dates.isna().to_numpy(), "not a date"
+
+    if data_type == 'boolean':
+        flags = [u if isinstance(u, (bool, np.bool_)) else _BOOLEANS.get(str(u).strip().lower())
+                 for u in uniques]
+        bad = np.array([f is None for f in flags], dtype=bool)
+        return pd.array(flags, dtype='boolean'), bad, "not a boolean"
+
+    if data_type in ('character varying', 'character') and info.max_length is not None:
+        lengths = np.array([len(str(u)) for u in uniques])
+        return None, lengths > info.max_length, f"longer than {info.max_length} characters"
+
+    return None, None, None
+
+
+def coerce_frame(table, df, catalog, max_examples=3):
+    """
+    Convert a remapped frame about to be pushed into table to the types of its columns, and
+    run every check on it.
+
+    Integer columns become Int64, numeric and floating point ones Float64, booleans boolean and
+    dates datetime64, so the loader gets native arrays instead of objects for PostgreSQL to cast.
+    Each column is converted once per distinct value. Cells that cannot be converted are reported
+    with the rows holding them (counting the rows of the frame from 1) and left NULL.
+
+    Returns:
+        tuple: (typed DataFrame, list of Issue for each column with a problem, empty if the
+               frame can be loaded)
+    """
+    issues = check_columns(table, list(df.columns), catalog)
+    if table not in catalog:
+        return df, issues
+    target = catalog[table]
+
+    out = df.copy(deep=False)
+    for i, (name, col) in enumerate(df.items()):
+        info = target.get(name)
+        if info is None:
+            continue
+        codes, uniques = pd.factorize(col, use_na_sentinel=True)
+        missing = codes == -1
+        if not info.nullable and missing.any():
+            issues.append(Issue(table, name, 'not null', "NULL in a NOT NULL column", int(missing.sum())))
+
+        uniques = np.asarray(uniques, dtype=object)
+        converted, flags, reason = _convert_uniques(uniques, info)
+        if converted is not None:
+            ## take() fills the missing cells (code -1) with NA
+            out.isetitem(i, pd.Series(converted.take(codes, allow_fill=True), index=col.index, name=name))
+        if flags is None or not flags.any():
+            continue
+        bad = np.append(flags, False)[codes]
+        check = 'length' if reason.startswith('longer') else 'type'
+        issues.append(Issue(table, name, check, reason, int(bad.sum()), tuple(uniques[flags][:max_examples]),
+                            tuple(int(r) + 1 for r in np.flatnonzero(bad)[:max_examples])))
+
+    return out, issues
+
+
+def check_frame(table, df, catalog, max_examples=3):
+    """
+    Every check of a remapped frame about to be pushed into table (coerce_frame without the frame).
+
+    Returns:
+        list: Issue for each column with a problem, empty if the frame can be loaded.
+    """
+    return coerce_frame(table, df, catalog, max_examples)[1]
+
+
+class ValidationReport:
+    """The problems found in a survey, printed once at the end"""
+
+    def __init__(self):
+        self.issues = []
+
+    def add(self, issues):
+        """Add issues, leaving out those already reported (the same mapping checked by both readers)"""
+        for issue in issues:
+            if not any(i[:3] == issue[:3] for i in self.issues):
+                self.issues.append(issue)
+
+    @property
+    def ok(self):
+        return not self.issues
+
+    @property
+    def tables(self):
+        return list(dict.fromkeys(i.table for i in self.issues))
+
+    def print(self):
+        if self.ok:
+            print("\n....Validation: every table fits the database....\n")
+            return
+        print(f"\n....Validation: {len(self.issues)} problems in {', '.join(self.tables)}, not loaded....")
+        for i in self.issues:
+            rows = f"{i.rows} rows: " if i.rows else ""
+            examples = f" e.g. {', '.join(repr(e) for e in i.examples)}" if i.examples else ""
+            at = f" at rows {', '.join(str(r) for r in i.at)}" if i.at else ""
+            print(f"  {i.table}.{i.column or '*'} [{i.check}] {rows}{i.message}{examples}{at}")
+        print()
@@ -0,0 +1,174 @@
+"""
+Single-pass reader for the RMN Excel survey templates.
+
+Opening the .xlsx once and parsing every mapped sheet from the same handle
+avoids unzipping the file and re-reading its shared-strings table for each
+sheet, which is what one pd.read_excel call per sheet used to do.
+"""
+
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+
+## read options for each sheet of the template, same as the old per-sheet pd.read_excel calls
+FEATURE_STATUS_SHEETS = [
+    'Feature status - drains',
+    'Feature status - gullies',
+    'Feature status - hags or banks',
+    'Feature status - bare peat',
+    'Feature status - F2B',
+]
+
+QUADRAT_SHEETS = ['Quadrat information', 'Vegetation', 'Photos']
+
+## long sheets (one row per species or photo) that can be streamed in chunks instead of read whole
+STREAMABLE_SHEETS = ['Vegetation', 'Photos']
+
+SHEET_READ_OPTIONS = {
+    'Desk study': dict(index_col=1, keep_default_na=False, na_values=[""]),
+    'Area-level assessment': dict(header=None, keep_default_na=False, na_values=[""]),
+}
+SHEET_READ_OPTIONS.update({s: dict(index_col=0, header=1, keep_default_na=False, na_values=[""]) for s in FEATURE_STATUS_SHEETS})
+SHEET_READ_OPTIONS.update({s: dict(index_col=0, keep_default_na=False, na_values=[""]) for s in QUADRAT_SHEETS})
+
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def sheet_members(file_path):
+    """{sheet name: its XML file inside the .xlsx zip}, read from the workbook parts only"""
+    with zipfile.ZipFile(file_path) as z:
+        rels = ET.fromstring(z.read('xl/_rels/workbook.xml.rels'))
+        workbook = ET.fromstring(z.read('xl/workbook.xml'))
+    targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{_PKG_REL_NS}Relationship')}
+
+    members = {}
+    for sheet in workbook.iter(f'{_MAIN_NS}sheet'):
+        target = targets.get(sheet.get(f'{_REL_NS}id'), '')
+        members[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('xl', target))
+    return members
+
+
+def sheet_sizes(file_path):
+    """
+    {sheet name: size of its XML in bytes} of a workbook, from the zip directory, without opening
+    it in openpyxl. Used to hand the largest sheets to the workers first.
+    """
+    with zipfile.ZipFile(file_path) as z:
+        sizes = {info.filename: info.file_size for info in z.infolist()}
+    return {sheet: sizes.get(member, 0) for sheet, member in sheet_members(file_path).items()}
+
+
+def read_workbook(file_path, sheets, engine="openpyxl"):
+    """
+    Open the workbook once and parse every requested sheet from it.
+
+    Parameters:
+        file_path (str): Path to the survey .xlsx file.
+        sheets (list): Sheet names to read, usually the sheets of interest from the map.
+        engine (str): pandas Excel engine. openpyxl is opened in read-only (streaming) mode by pandas.
+
+    Returns:
+        dict: {sheet name: DataFrame} for every requested sheet present in the workbook.
+              Sheets missing from the workbook are left out so the caller can report them.
+    """
+    workbook = {}
+
+    with pd.ExcelFile(file_path, engine=engine) as xls:
+        for s in sheets:
+            if s not in xls.sheet_names:
+                continue
+            workbook[s] = read_sheet(xls, s)
+
+    return workbook
+
+
+def read_sheet(xls, sheet):
+    """
+    Parse one sheet from an open pd.ExcelFile, for the per-sheet workers of the Excel reader.
+
+    Raises:
+        ValueError: if the sheet is not in the workbook.
+    """
+    if sheet not in xls.sheet_names:
+        raise ValueError(sheet)
+    return xls.parse(sheet_name=sheet, **SHEET_READ_OPTIONS.get(sheet, {}))
+
+
+def _cell_value(cell):
+    """A cell as the pandas openpyxl reader gives it (whole numbers as int), with empty and error cells as NaN"""
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    value = cell.value
+    if value is None or value == "" or cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC and int(value) == value:
+        return int(value)
+    return value
+
+
+def _is_missing(value):
+    return isinstance(value, float) and np.isnan(value)
+
+
+def iter_sheet_chunks(file_path, sheet, chunk_rows=10000, columns=None):
+    """
+    Stream a quadrat layout sheet (header row, then a row of data types, then one record per row)
+    through openpyxl's read-only row iterator, in frames of at most chunk_rows records.
+
+    Gives the rows prepare_quadrat_sheet would, without ever holding the whole sheet: blank
+    records are left out and the data types row is skipped. The first column comes first,
+    named after its header as reset_index names it.
+
+    Parameters:
+        file_path (str): Path to the survey .xlsx file.
+        sheet (str): Sheet name.
+        chunk_rows (int): Records per frame.
+        columns (iterable): Headers of the other columns to keep, usually the template names of
+                            the mapping. A column missing from the sheet is left out. All columns when None.
+
+    Yields:
+        DataFrame: object columns, cells as read_workbook would give them.
+
+    Raises:
+        ValueError: if the sheet is not in the workbook.
+    """
+    from openpyxl import load_workbook
+
+    book = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        if sheet not in book.sheetnames:
+            raise ValueError(sheet)
+        worksheet = book[sheet]
+        worksheet.reset_dimensions()  # the stored dimensions can't be trusted in read-only mode
+        rows = ([_cell_value(cell) for cell in row] for row in worksheet.rows)
+
+        ## header: the first row with a value; records: rows with a value besides the first column
+        header = next((row for row in rows if not all(_is_missing(v) for v in row)), None)
+        if header is None:
+            return
+        names, positions = ['index' if _is_missing(header[0]) else header[0]], [0]
+        for i, name in enumerate(header[1:], start=1):
+            if not _is_missing(name) and name not in names and (columns is None or name in columns):
+                names.append(name)
+                positions.append(i)
+
+        records = (row for row in rows if not all(_is_missing(v) for v in row[1:]))
+        next(records, None)  # the data types row
+
+        chunk = []
+        for row in records:
+            chunk.append([row[i] if i < len(row) else np.nan for i in positions])
+            if len(chunk) == chunk_rows:
+                yield pd.DataFrame(chunk, columns=names, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=names, dtype=object)
+    finally:
+        book.close()
@@ -0,0 +1,113 @@
+"""
+Shared fixtures. The database tests need a scratch PostgreSQL 15+ database:
+
+    RMN_TEST_DSN="dbname=rmn_test user=postgres" python -m pytest -q
+
+They are skipped when RMN_TEST_DSN is not set. Each one works in its own schema,
+dropped afterwards. The others run against FakeConnection, which only records
+what a psycopg2 connection would have committed.
+"""
+
+import os
+
+import psycopg2
+import pytest
+
+
+TEST_SCHEMA = "rmn_etl_test"
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def execute(self, query, params=None):
+        self.connection.execute(query, params)
+        self.rowcount = 1
+
+    def copy_expert(self, query, buffer):
+        self.connection.execute(query, buffer.getvalue())
+
+    def fetchall(self):
+        return self.connection.results.pop(0) if self.connection.results else []
+
+    def fetchone(self):
+        rows = self.fetchall()
+        return rows[0] if rows else None
+
+
+class FakeConnection:
+    """
+    Stands in for a psycopg2 connection. Statements go to pending until commit() moves them to
+    committed, rollback() and ROLLBACK TO SAVEPOINT drop them.
+
+    Parameters:
+        results (list): Rows returned by the successive fetchall() calls, [] once they run out.
+        fail (callable): fail(query) is True for the statements that raise psycopg2.DatabaseError.
+    """
+
+    def __init__(self, results=None, fail=None):
+        self.results = list(results or [])
+        self.fail = fail or (lambda query: False)
+        self.pending = []
+        self.committed = []
+        self.commits = 0
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def execute(self, query, params):
+        if self.fail(query):
+            raise psycopg2.DatabaseError(f"failed: {query}")
+        if query.startswith("ROLLBACK TO SAVEPOINT"):
+            name = query.split()[-1]
+            while self.pending.pop()[0] != f"SAVEPOINT {name}":
+                pass
+        self.pending.append((query, params))
+
+    def commit(self):
+        self.commits += 1
+        self.committed.extend(q for q in self.pending if not q[0].startswith(("SAVEPOINT", "RELEASE", "ROLLBACK")))
+        self.pending = []
+
+    def rollback(self):
+        self.pending = []
+
+    def close(self):
+        self.closed = 1
+
+    def committed_like(self, start):
+        """Committed statements starting with start"""
+        return [q for q, _ in self.committed if q.startswith(start)]
+
+
+@pytest.fixture
+def db():
+    """Connection to the test database, with an empty TEST_SCHEMA"""
+    dsn = os.environ.get("RMN_TEST_DSN")
+    if not dsn:
+        pytest.skip("RMN_TEST_DSN is not set")
+    conn = psycopg2.connect(dsn)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {TEST_SCHEMA}")
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {TEST_SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
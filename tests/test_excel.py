@@ -0,0 +1,52 @@
+import os
+
+from benchmarks.synthetic import write_mapping, write_survey_workbook
+from rmn_etl.excel import stream_sheet
+from rmn_etl.loader import DatabaseSink
+from rmn_etl.mapping import load_mapping
+
+from conftest import FakeConnection
+
+
+SURVEY = ["MS01", "502418", "1-year"]
+
+
+def survey_files(tmp_path):
+    path, map_path = os.path.join(tmp_path, "survey.xlsx"), os.path.join(tmp_path, "map.xlsx")
+    write_survey_workbook(path, quadrats=10, species=3, drains=5)
+    write_mapping(map_path)
+    return path, load_mapping(map_path, use_cache=False)
+
+
+def test_streamed_sheet_is_committed_after_its_last_chunk(tmp_path):
+    path, mapping = survey_files(tmp_path)
+    conn = FakeConnection()
+    sink = DatabaseSink(conn, ["vegetation"], SURVEY, coerce=False)
+
+    table, loaded, read = stream_sheet("Vegetation", path, mapping, *SURVEY, sink, chunk_rows=10)
+
+    assert (table, loaded, read) == ("vegetation", 30, 30)
+    assert len(conn.committed_like("COPY")) == 3
+    assert conn.commits == 1
+    assert sink.failed == []
+
+
+def test_chunk_failing_half_way_commits_nothing(tmp_path):
+    path, mapping = survey_files(tmp_path)
+    copies = []
+
+    def second_copy_fails(query):
+        if query.startswith("COPY"):
+            copies.append(query)
+            return len(copies) == 2
+        return False
+
+    conn = FakeConnection(fail=second_copy_fails)
+    sink = DatabaseSink(conn, ["vegetation"], SURVEY, coerce=False)
+
+    table, loaded, read = stream_sheet("Vegetation", path, mapping, *SURVEY, sink, chunk_rows=10)
+
+    assert (table, loaded, read) == ("vegetation", 0, 20)
+    assert conn.committed == []
+    assert sink.failed == ["vegetation"]
+    assert "vegetation" not in sink.presence.existing
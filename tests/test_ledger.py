@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from benchmarks.synthetic import write_mapping, write_monitoring_gpkg, write_survey_workbook
+from rmn_etl.excel import load_excel_survey
+from rmn_etl.ledger import FileFingerprint
+from rmn_etl.mapping import load_mapping
+from rmn_etl.spatial import load_spatial_survey
+
+from conftest import FakeConnection
+
+
+SURVEY = ["MS01", "502418", "1-year"]
+
+
+@pytest.fixture
+def mapping(tmp_path):
+    map_path = os.path.join(tmp_path, "map.xlsx")
+    write_mapping(map_path)
+    return load_mapping(map_path, use_cache=False)
+
+
+def touched_since_import(path, mapping):
+    """FakeConnection whose ledger holds the file as imported, with an older mtime"""
+    fp = FileFingerprint(path)
+    last = (fp.size, fp.mtime - 60, fp.sha256, mapping.version, fp.parts, {}, 7)
+    return FakeConnection(results=[[last]])
+
+
+@pytest.mark.parametrize("atomic", [False, True])
+@pytest.mark.parametrize("kind", ["excel", "spatial"])
+def test_unchanged_but_touched_file_commits_the_mtime_refresh(tmp_path, mapping, kind, atomic):
+    if kind == "excel":
+        path, load = os.path.join(tmp_path, "survey.xlsx"), load_excel_survey
+        write_survey_workbook(path, quadrats=5, species=2, drains=5)
+    else:
+        path, load = os.path.join(tmp_path, "monitoring.gpkg"), load_spatial_survey
+        write_monitoring_gpkg(path, quadrats=5, drains=5)
+    conn = touched_since_import(path, mapping)
+
+    assert load(path, *SURVEY, conn=conn, mapping=mapping, ledger=True, atomic=atomic) == {}
+
+    refreshed = conn.committed_like("UPDATE")
+    assert len(refreshed) == 1 and "SET file_mtime" in refreshed[0]
+    assert conn.pending == []  # no transaction left open on the caller's connection
@@ -0,0 +1,66 @@
+import pandas as pd
+
+from rmn_etl.loader import NATURAL_KEYS, number_entries, push_dataframe
+
+from conftest import TEST_SCHEMA
+
+
+TABLE = f"{TEST_SCHEMA}.vegetation"
+KEYS = NATURAL_KEYS["vegetation"]
+SURVEY = ["MS01", "502418", "1-year"]
+
+
+def create_vegetation(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE {TABLE} (
+                rmn_id VARCHAR(10), grant_id VARCHAR(10), visit VARCHAR(50),
+                sampling_point VARCHAR(255), species VARCHAR(255), cover DECIMAL(5,2),
+                entry INT NOT NULL DEFAULT 1,
+                UNIQUE NULLS NOT DISTINCT (rmn_id, grant_id, visit, sampling_point, species, entry))
+        """)
+    conn.commit()
+
+
+def vegetation(rows, survey=SURVEY):
+    df = pd.DataFrame(rows, columns=["sampling_point", "species", "cover"])
+    df.insert(0, "visit", survey[2])
+    df.insert(0, "grant_id", survey[1])
+    df.insert(0, "rmn_id", survey[0])
+    return number_entries(df, KEYS)[0]
+
+
+def stored(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT rmn_id, sampling_point, species, cover, entry FROM {TABLE} ORDER BY 1, 2, 3, 5")
+        return [(r, p, s, float(c), e) for r, p, s, c, e in cur.fetchall()]
+
+
+def test_merge_replaces_a_corrected_key(db):
+    create_vegetation(db)
+    other = ["MS02", "502418", "1-year"]
+    push_dataframe(db, vegetation([("Q1", "Calluna", 10)], other), TABLE, method="merge", survey=other)
+    push_dataframe(db, vegetation([("Q1", "Calluna", 20), ("Q1", "Sphagnm", 30), ("Q2", None, 5)]),
+                   TABLE, method="merge", survey=SURVEY)
+
+    ## the species typo is fixed and the cover of Q1 Calluna corrected
+    push_dataframe(db, vegetation([("Q1", "Calluna", 25), ("Q1", "Sphagnum", 30), ("Q2", None, 5)]),
+                   TABLE, method="merge", survey=SURVEY)
+
+    assert stored(db) == [
+        ("MS01", "Q1", "Calluna", 25.0, 1),
+        ("MS01", "Q1", "Sphagnum", 30.0, 1),
+        ("MS01", "Q2", None, 5.0, 1),
+        ("MS02", "Q1", "Calluna", 10.0, 1),
+    ]
+
+
+def test_merge_in_chunks_keeps_the_earlier_chunks(db):
+    create_vegetation(db)
+    push_dataframe(db, vegetation([("Q1", "Calluna", 20), ("Q2", "Erica", 5)]), TABLE, method="merge", survey=SURVEY)
+
+    first, second = vegetation([("Q1", "Calluna", 20)]), vegetation([("Q2", "Erica", 5)])
+    push_dataframe(db, first, TABLE, method="merge", survey=SURVEY)
+    push_dataframe(db, second, TABLE, method="merge", survey=SURVEY, kept=first[KEYS])
+
+    assert stored(db) == [("MS01", "Q1", "Calluna", 20.0, 1), ("MS01", "Q2", "Erica", 5.0, 1)]